@@ -1,28 +1,283 @@
+import random
+import time
+import tracemalloc
+from array import array
+from collections import deque
+
+try:
+    import numpy
+except ImportError:     # numpy only makes building faster
+    numpy = None
+
+
+class Node(object):
+    def __init__(self, value=None):
+        self.value = value
+        self.connected = []     # list of nodes this node has an edge to
+
+
+def connected_nodes(node):
+    return node.connected
+
 
 def BFS(root, target):
-    queue = [root]      # using list as a queue (first in first out)
-    visited = set()
+    path = bfs_path([root], target=target)
+    if path:
+        return path[-1]
+
+
+def bfs_path(sources, target=None, predicate=None, max_depth=None, neighbors=connected_nodes):
+    """
+    Breadth first search from one or many source nodes
+    :param sources: list of start nodes, more than one for multi-source search
+    :param target: node to find
+    :param predicate: function, find the first node that predicate(node) is true, instead of target
+    :param max_depth: do not follow more than max_depth edges from sources
+    :param neighbors: function that returns connected nodes of a node
+    :return: path list from the nearest source to the found node, or None if not found
+    """
+    def found(node):
+        if predicate is not None:
+            return predicate(node)
+        return node == target
+
+    parent = {}       # node: node it was reached from, also the visited set
+    queue = deque()   # deque pops from left in O(1)
+    for source in sources:
+        if source not in parent:
+            parent[source] = None
+            queue.append((source, 0))
     while queue:        # while there is still have node
-        current = queue.pop(0)        # get first one
-        if current is target:        # check if it is target
-            return current
-        visited.add(current)          # mark as visited
-        for node in current.connected:   
-        # Added all not visited connected nodes to queue
-            if node not in visited:
+        current, depth = queue.popleft()        # get first one
+        if found(current):        # check if it is target
+            path = [current]
+            while parent[path[-1]] is not None:       # walk back to the source
+                path.append(parent[path[-1]])
+            path.reverse()
+            return path
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for node in neighbors(current):
+            # mark as visited when queued, so every node is queued only once
+            if node not in parent:
+                parent[node] = current
+                queue.append((node, depth + 1))
+    return None
+
+
+def benchmark_bfs(sizes=(10000, 20000, 40000, 80000)):
+    """
+    Compare bfs_path with the list based BFS on wide graphs, where the root is connected to every other node
+    and every node is connected back to the root, and the target is not reachable.
+    :return: a list of (number of nodes, list BFS seconds, bfs_path seconds)
+    """
+    def list_bfs(root, target):
+        queue = [root]
+        visited = set()
+        while queue:
+            current = queue.pop(0)
+            if current is target:
+                return current
+            visited.add(current)
+            for node in current.connected:
+                if node not in visited:
+                    queue.append(node)
+
+    result = []
+    for size in sizes:
+        root = Node(0)
+        root.connected = [Node(i) for i in range(1, size)]
+        for node in root.connected:
+            node.connected = [root]
+        target = Node()
+
+        start_time = time.time()
+        list_bfs(root, target)
+        list_seconds = time.time() - start_time
+
+        start_time = time.time()
+        bfs_path([root], target=target)
+        deque_seconds = time.time() - start_time
+        result.append((size, list_seconds, deque_seconds))
+    return result
+
+
+WHITE, GRAY, BLACK = 0, 1, 2     # not visited, on current DFS path, finished
+
+
+def reachable_graph(root, neighbors=connected_nodes):
+    """
+    Adjacency of every node reachable from root
+    :return: dict of node: list of connected nodes, without duplicates
+    """
+    graph = {root: None}
+    queue = deque([root])
+    while queue:
+        current = queue.popleft()
+        graph[current] = list(dict.fromkeys(neighbors(current)))
+        for node in graph[current]:
+            if node not in graph:
+                graph[node] = None
                 queue.append(node)
+    return graph
+
+
+def find_cycle(root, neighbors=connected_nodes):
+    """
+    Find one cycle with iterative depth first search and three-colour marking
+    :param root: graph
+    :return: cycle path list, or None if there is no cycle
+    """
+    color = {root: GRAY}
+    path = [root]
+    stack = [iter(neighbors(root))]
+    while stack:
+        for node in stack[-1]:
+            state = color.get(node, WHITE)
+            if state == GRAY:       # back edge to a node on current path
+                return path[path.index(node):]
+            if state == WHITE:
+                color[node] = GRAY
+                path.append(node)
+                stack.append(iter(neighbors(node)))
+                break
+        else:       # all connected nodes are done
+            color[path.pop()] = BLACK
+            stack.pop()
+    return None
+
+
+def has_cycle(root, neighbors=connected_nodes):
+    return find_cycle(root, neighbors) is not None
+
+
+def tarjan_components(graph):
+    """
+    Tarjan strongly connected components, without recursion
+    :param graph: dict of node: iterable of connected nodes, every connected node has to be a key
+    :return: a list of component node lists
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    for start in graph:
+        if start in index:
+            continue
+        index[start] = lowlink[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(graph[start]))]
+        while work:
+            current, connected = work[-1]
+            for node in connected:
+                if node not in index:
+                    index[node] = lowlink[node] = len(index)
+                    stack.append(node)
+                    on_stack.add(node)
+                    work.append((node, iter(graph[node])))
+                    break
+                elif node in on_stack:
+                    lowlink[current] = min(lowlink[current], index[node])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[current])
+                if lowlink[current] == index[current]:      # current is root of a component
+                    component = []
+                    while True:
+                        node = stack.pop()
+                        on_stack.discard(node)
+                        component.append(node)
+                        if node == current:
+                            break
+                    components.append(component)
+    return components
 
 
-def cycle_detector(root, current_path, result):
-    if root in current_path:             # check if it is a cycle or not
-        # if it is a cycle, add path of cycle to result.
-        result.append(current_path[current_path.index(root):])
-    else:
-        # if it is not a cycle, add this node to path list
-        current_path.append(root)
-    for node in root.connected:  # check all connected node
-        # recursive with connected node
-        cycle_detector(node, current_path, result)
+def strongly_connected_components(root, neighbors=connected_nodes):
+    """
+    :param root: graph
+    :return: a list of strongly connected component node lists
+    """
+    return tarjan_components(reachable_graph(root, neighbors))
+
+
+def simple_cycles(root, max_cycles=None, max_length=None, neighbors=connected_nodes):
+    """
+    Generate every elementary cycle with Johnson's algorithm, without recursion
+    :param root: graph
+    :param max_cycles: stop after this many cycles
+    :param max_length: only generate cycles with at most this many nodes
+    :param neighbors: function that returns connected nodes of a node
+    :return: generator of cycle path lists
+    """
+    graph = reachable_graph(root, neighbors)
+    count = 0
+    if max_cycles is not None and max_cycles <= 0:
+        return
+
+    # self loops are cycles of one node
+    for node, connected in graph.items():
+        if node in connected:
+            yield [node]
+            count += 1
+            if max_cycles is not None and count >= max_cycles:
+                return
+    graph = dict((node, set(connected) - {node}) for node, connected in graph.items())
+
+    def unblock(node, blocked, blocked_by):
+        nodes = {node}
+        while nodes:
+            node = nodes.pop()
+            if node in blocked:
+                blocked.remove(node)
+                nodes.update(blocked_by[node])
+                blocked_by[node].clear()
+
+    components = [set(component) for component in tarjan_components(graph) if len(component) > 1]
+    while components:
+        component = components.pop()
+        subgraph = dict((node, graph[node] & component) for node in component)
+        start = component.pop()
+        path = [start]
+        blocked = {start}
+        closed = set()      # nodes on a path that reached start, they are unblocked when left
+        blocked_by = dict((node, set()) for node in subgraph)
+        stack = [(start, list(subgraph[start]))]
+        while stack:
+            current, connected = stack[-1]
+            if connected:
+                node = connected.pop()
+                if node == start:
+                    yield path[:]
+                    count += 1
+                    if max_cycles is not None and count >= max_cycles:
+                        return
+                    closed.update(path)
+                elif node not in blocked:
+                    if max_length is not None and len(path) >= max_length:
+                        closed.update(path)     # cut by length, so nothing on path may stay blocked
+                    else:
+                        path.append(node)
+                        stack.append((node, list(subgraph[node])))
+                        closed.discard(node)
+                        blocked.add(node)
+                        continue
+            if not connected:
+                if current in closed:
+                    unblock(current, blocked, blocked_by)
+                else:
+                    for node in subgraph[current]:
+                        blocked_by[node].add(current)
+                stack.pop()
+                path.pop()
+        # find cycles without start in the rest of the component
+        rest = dict((node, subgraph[node] & component) for node in component)
+        components.extend(set(rest_component) for rest_component in tarjan_components(rest)
+                          if len(rest_component) > 1)
 
 
 def cycle_detection(root):
@@ -31,6 +286,305 @@ def cycle_detection(root):
     :param root: graph
     :return: a list of cycle path list
     """
-    result = []
-    cycle_detector(root, [], result)
-    return result
+    return list(simple_cycles(root))
+
+
+def brute_force_cycles(graph):
+    """
+    Every elementary cycle of a small graph, by following every simple path, for checking simple_cycles
+    :param graph: dict of node: iterable of connected nodes, every connected node has to be a key
+    :return: set of cycle tuples, each rotated to start at its smallest node
+    """
+    order = dict((node, i) for i, node in enumerate(sorted(graph)))
+    cycles = set()
+    for start in graph:
+        # only visit nodes after start, so every cycle is found once, from its smallest node
+        stack = [[start]]
+        while stack:
+            path = stack.pop()
+            for node in graph[path[-1]]:
+                if node == start:
+                    cycles.add(tuple(path))
+                elif order[node] > order[start] and node not in path:
+                    stack.append(path + [node])
+    return cycles
+
+
+def canonical_cycle(cycle):
+    position = cycle.index(min(cycle))
+    return tuple(cycle[position:]) + tuple(cycle[:position])
+
+
+def check_cycle_functions(num_graphs=200, max_nodes=8, first_id=1000, seed=0):
+    """
+    Compare simple_cycles, find_cycle and strongly_connected_components with brute force on random graphs.
+    Nodes are ints from first_id on, above the small ints Python keeps one object of, and the neighbors function
+    returns new int objects, so a node compared by identity instead of value makes the check fail.
+    :return: number of cycles checked
+    """
+    random_generator = random.Random(seed)
+    checked = 0
+    for _ in range(num_graphs):
+        nodes = list(range(first_id + 1, first_id + 1 + random_generator.randint(1, max_nodes)))
+        graph = dict((node, [other for other in nodes if random_generator.random() < 0.3]) for node in nodes)
+        graph[first_id] = list(nodes)       # root reaches every node and is on no cycle
+
+        def neighbors(node, graph=graph):
+            return [int(str(other)) for other in graph[node]]
+
+        expected = brute_force_cycles(graph)
+        cycles = [canonical_cycle(cycle) for cycle in simple_cycles(first_id, neighbors=neighbors)]
+        assert len(cycles) == len(set(cycles)) and set(cycles) == expected, (graph, cycles, expected)
+
+        cycle = find_cycle(first_id, neighbors=neighbors)
+        assert (cycle is not None) == bool(expected), (graph, cycle)
+        if cycle is not None:
+            assert canonical_cycle(cycle) in expected, (graph, cycle)
+
+        reachable = {}
+        for node in graph:
+            reachable[node] = set()
+            stack = list(graph[node])
+            while stack:
+                other = stack.pop()
+                if other not in reachable[node]:
+                    reachable[node].add(other)
+                    stack.extend(graph[other])
+        expected_components = set(frozenset([node] + [other for other in reachable[node] if node in reachable[other]])
+                                  for node in graph)
+        components = strongly_connected_components(first_id, neighbors=neighbors)
+        assert set(frozenset(component) for component in components) == expected_components, (graph, components)
+        checked += len(expected)
+    return checked
+
+
+class CSRGraph(object):
+    """
+    Compact array-backed graph in compressed sparse row form.
+    Nodes are integer ids 0..num_nodes-1, and connected nodes of node i are indices[indptr[i]:indptr[i + 1]].
+    labels maps ids back to the original nodes, e.g. program object_ids.
+    """
+
+    def __init__(self, indptr, indices, labels=None):
+        self.indptr = indptr        # array('q'), num_nodes + 1 offsets
+        self.indices = indices      # array('i'), connected node ids of all nodes
+        self.labels = labels
+        self.ids = dict((label, node_id) for node_id, label in enumerate(labels)) if labels is not None else None
+
+    @property
+    def num_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, edges, labels=None):
+        """
+        :param edges: iterable of (source, target) pairs, e.g.
+                      Program.same_as_many.through.objects.values_list('from_program_id', 'to_program_id')
+        :param labels: list of all nodes, ids follow its order; nodes are numbered as first seen if None
+        :return: CSRGraph
+        :raise ValueError: if labels is given and an edge endpoint is not in it
+        """
+        ids = dict((label, node_id) for node_id, label in enumerate(labels)) if labels is not None else {}
+        sources = array('i')
+        targets = array('i')
+        for source, target in edges:
+            if labels is None:
+                sources.append(ids.setdefault(source, len(ids)))
+                targets.append(ids.setdefault(target, len(ids)))
+                continue
+            for node, node_ids in ((source, sources), (target, targets)):
+                if node not in ids:
+                    raise ValueError('Edge ({0!r}, {1!r}) has a node that is not in labels: {2!r}'
+                                     .format(source, target, node))
+                node_ids.append(ids[node])
+        num_nodes = len(ids)
+        if labels is None:
+            labels = [None] * num_nodes
+            for label, node_id in ids.items():
+                labels[node_id] = label
+
+        if numpy is not None and len(sources):
+            source_ids = numpy.frombuffer(sources, dtype=numpy.int32)
+            order = numpy.argsort(source_ids, kind='stable')
+            indices = array('i', numpy.frombuffer(targets, dtype=numpy.int32)[order].tobytes())
+            counts = numpy.bincount(source_ids, minlength=num_nodes)
+            indptr = array('q', numpy.concatenate(([0], numpy.cumsum(counts))).astype(numpy.int64).tobytes())
+        else:
+            indptr = array('q', [0]) * (num_nodes + 1)
+            for source in sources:      # count edges of every node
+                indptr[source + 1] += 1
+            for node_id in range(num_nodes):
+                indptr[node_id + 1] += indptr[node_id]
+            indices = array('i', [0]) * len(targets)
+            position = array('q', indptr[:-1])
+            for source, target in zip(sources, targets):
+                indices[position[source]] = target
+                position[source] += 1
+        return cls(indptr, indices, labels)
+
+    @classmethod
+    def from_nodes(cls, root, neighbors=connected_nodes):
+        """
+        Convert the object graph reachable from root, root gets id 0
+        """
+        graph = reachable_graph(root, neighbors)
+        labels = list(graph)
+        return cls.from_edges(((node, connected) for node in labels for connected in graph[node]), labels)
+
+    def neighbors(self, node_id):
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]
+
+    def bfs_path(self, sources, target=None, predicate=None, max_depth=None):
+        """
+        Same as bfs_path, on node ids, with a bitset as visited set
+        :return: path list of node ids, or None if not found
+        """
+        indptr = self.indptr
+        indices = self.indices
+        visited = bytearray((self.num_nodes + 7) // 8)
+        parent = array('i', [-1]) * self.num_nodes
+        depth = array('i', [0]) * self.num_nodes
+        queue = deque()
+        for source in sources:
+            if not visited[source >> 3] & (1 << (source & 7)):
+                visited[source >> 3] |= 1 << (source & 7)
+                queue.append(source)
+        while queue:
+            current = queue.popleft()
+            if (predicate(current) if predicate is not None else current == target):
+                path = [current]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+            if max_depth is not None and depth[current] >= max_depth:
+                continue
+            for i in range(indptr[current], indptr[current + 1]):
+                node = indices[i]
+                if not visited[node >> 3] & (1 << (node & 7)):
+                    visited[node >> 3] |= 1 << (node & 7)
+                    parent[node] = current
+                    depth[node] = depth[current] + 1
+                    queue.append(node)
+        return None
+
+    def find_cycle(self, root=0):
+        """
+        Same as find_cycle, on node ids
+        :return: cycle path list of node ids, or None if there is no cycle
+        """
+        indptr = self.indptr
+        indices = self.indices
+        color = bytearray(self.num_nodes)
+        color[root] = GRAY
+        path = [root]
+        positions = [indptr[root]]      # next edge to check, for every node on path
+        while path:
+            current = path[-1]
+            i = positions[-1]
+            if i < indptr[current + 1]:
+                positions[-1] = i + 1
+                node = indices[i]
+                if color[node] == GRAY:
+                    return path[path.index(node):]
+                if color[node] == WHITE:
+                    color[node] = GRAY
+                    path.append(node)
+                    positions.append(indptr[node])
+            else:
+                color[current] = BLACK
+                path.pop()
+                positions.pop()
+        return None
+
+    def has_cycle(self, root=0):
+        return self.find_cycle(root) is not None
+
+    def simple_cycles(self, root=0, max_cycles=None, max_length=None):
+        return simple_cycles(root, max_cycles, max_length, neighbors=self.neighbors)
+
+    def strongly_connected_components(self, root=0):
+        return strongly_connected_components(root, neighbors=self.neighbors)
+
+
+def check_csr_graph(num_graphs=200, max_nodes=8, padding=300, seed=0):
+    """
+    Compare CSRGraph traversals with brute force and with the object graph functions on random graphs.
+    padding isolated nodes come first, so the checked node ids are above the small ints Python keeps one object of.
+    :return: number of cycles checked
+    """
+    random_generator = random.Random(seed)
+    checked = 0
+    for _ in range(num_graphs):
+        nodes = list(range(padding + 1, padding + 1 + random_generator.randint(1, max_nodes)))
+        graph = dict((node, [other for other in nodes if random_generator.random() < 0.3]) for node in nodes)
+        graph[padding] = list(nodes)        # root reaches every node and is on no cycle
+        csr = CSRGraph.from_edges(((node, other) for node in graph for other in graph[node]),
+                                  labels=list(range(padding)) + [padding] + nodes)
+        root = csr.ids[padding]
+
+        expected = brute_force_cycles(graph)
+        cycles = [canonical_cycle([csr.labels[node_id] for node_id in cycle]) for cycle in csr.simple_cycles(root)]
+        assert len(cycles) == len(set(cycles)) and set(cycles) == expected, (graph, cycles, expected)
+
+        cycle = csr.find_cycle(root)
+        assert (cycle is not None) == bool(expected), (graph, cycle)
+        if cycle is not None:
+            assert canonical_cycle([csr.labels[node_id] for node_id in cycle]) in expected, (graph, cycle)
+
+        components = set(frozenset(csr.labels[node_id] for node_id in component)
+                         for component in csr.strongly_connected_components(root))
+        expected_components = set(frozenset(component) for component in
+                                  strongly_connected_components(padding, neighbors=lambda node: graph[node]))
+        assert components == expected_components, (graph, components)
+
+        target = random_generator.choice(nodes)
+        path = csr.bfs_path([root], target=csr.ids[target])
+        expected_path = bfs_path([padding], target=target, neighbors=lambda node: graph[node])
+        assert len(path) == len(expected_path) and csr.labels[path[-1]] == target, (graph, path, expected_path)
+        checked += len(expected)
+    return checked
+
+
+def benchmark_csr(num_nodes=100000, degree=10):
+    """
+    Compare memory and BFS throughput of the object graph and CSRGraph on a random graph
+    :return: dict of bytes per million edges and edges traversed per second of both
+    """
+    random_generator = random.Random(0)
+    edges = [(i, random_generator.randrange(num_nodes)) for i in range(num_nodes) for _ in range(degree)]
+    num_edges = len(edges)
+
+    tracemalloc.start()
+    nodes = [Node(i) for i in range(num_nodes)]
+    for source, target in edges:
+        nodes[source].connected.append(nodes[target])
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    graph = CSRGraph.from_edges(edges, labels=list(range(num_nodes)))
+    graph.labels = graph.ids = None     # only count the arrays
+    csr_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start_time = time.time()
+    bfs_path([nodes[0]], target=Node())
+    object_seconds = time.time() - start_time
+
+    start_time = time.time()
+    graph.bfs_path([0], target=-1)
+    csr_seconds = time.time() - start_time
+
+    return {
+        'num_nodes': num_nodes,
+        'num_edges': num_edges,
+        'object_bytes_per_million_edges': object_bytes * 1000000 // num_edges,
+        'csr_bytes_per_million_edges': csr_bytes * 1000000 // num_edges,
+        'object_edges_per_second': int(num_edges / object_seconds),
+        'csr_edges_per_second': int(num_edges / csr_seconds),
+    }
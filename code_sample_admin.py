@@ -1,30 +1,218 @@
+def annotate_program_assignment(queryset):
+    """
+    Annotate programs with their assignee, reviewer, assignment status and review status.
+    All four values come from correlated subqueries, so they are loaded by the same query as the programs.
+    :param queryset: Program queryset
+    :return: annotated queryset
+    """
+    assignments = ProgramAssignment.objects.filter(program=OuterRef('pk'))
+    proofs = ProgramProof.objects.filter(program=OuterRef('pk'))
+    return queryset.annotate(
+        annotated_assignee=Subquery(assignments.values('assignee__username')[:1]),
+        annotated_assignment_status=Subquery(assignments.values('status')[:1]),
+        annotated_reviewer=Subquery(proofs.values('reviewer__username')[:1]),
+        annotated_review_status=Subquery(proofs.values('status')[:1]),
+    )
+
+
+BATCH_UPDATE_FORM_TABLES = OrderedDict([
+    ('program_form', 'program'),
+    ('duration_form', 'duration'),
+    ('curriculum_form', 'curriculum'),
+    ('tuition_form', 'tuition'),
+    ('deadline_form', 'deadline'),
+    ('requirement_form', 'requirement'),
+    ('scholarship_form', 'scholarship'),
+])
+BATCH_UPDATE_FORMS = OrderedDict([
+    ('program_form', ProgramForm),
+    ('duration_form', DurationForm),
+    ('curriculum_form', CurriculumForm),
+    ('tuition_form', TuitionForm),
+    ('deadline_form', DeadlineForm),
+    ('requirement_form', RequirementForm),
+    ('scholarship_form', ScholarshipForm),
+])
+BATCH_UPDATE_FORM_ATTRS = OrderedDict([
+    ('program_form', BATCH_UPDATE_PROGRAM),
+    ('duration_form', BATCH_UPDATE_DURATION),
+    ('curriculum_form', BATCH_UPDATE_CURRICULUM),
+    ('tuition_form', BATCH_UPDATE_TUITION),
+    ('deadline_form', BATCH_UPDATE_DEADLINE),
+    ('requirement_form', BATCH_UPDATE_REQUIREMENT),
+    ('scholarship_form', BATCH_UPDATE_SCHOLARSHIP),
+])
+
+
+class ProgramBatchUpdate(object):
+    """
+    Set-based batch update of programs and their related tables.
+    The selected forms are validated once for the whole batch. Then every table gets one grouped UPDATE for
+    all programs that have it, and the history rows are inserted with one bulk_create.
+    """
+
+    def __init__(self, user, data):
+        """
+        :param user: user who runs the batch update
+        :param data: submitted data of the batch update page (request.POST)
+        """
+        self.user = user
+        self.tables = []                # selected tables, in form order
+        self.changes = OrderedDict()    # valid tables: {table name: {attribute: new value}}
+        for form_name, form in BATCH_UPDATE_FORMS.items():
+            if data.get(form_name) != form_name:
+                continue
+            table_name = BATCH_UPDATE_FORM_TABLES[form_name]
+            self.tables.append(table_name)
+            save_form = form(data)
+            if save_form.is_valid():
+                self.changes[table_name] = OrderedDict(
+                    (attribute, save_form.cleaned_data[attribute])
+                    for attribute in BATCH_UPDATE_FORM_ATTRS[form_name] if attribute in data)
+
+    def apply(self, queryset):
+        """
+        Update all programs of queryset in one transaction.
+        :param queryset: Program queryset
+        :return: a list of (program, updated table names, not updated table names)
+        """
+        related_tables = [table_name for table_name in self.changes if table_name != 'program']
+        programs = list(queryset.select_related(*related_tables))
+
+        results = []
+        changed_programs = []
+        table_program_ids = dict((table_name, []) for table_name in related_tables)
+        for program in programs:
+            updated_tables = []
+            not_updated_tables = []
+            updated_attrs = []
+            for table_name in self.tables:
+                if table_name in self.changes and (table_name == 'program' or hasattr(program, table_name)):
+                    if table_name != 'program':
+                        table_program_ids[table_name].append(program.pk)
+                    updated_tables.append(table_name)
+                    updated_attrs.extend(self.changes[table_name])
+                else:
+                    not_updated_tables.append(table_name)
+            if updated_attrs:
+                changed_programs.append((program, updated_attrs))
+            results.append((program, updated_tables, not_updated_tables))
+
+        now = timezone.now()
+        with transaction.atomic():
+            for table_name in related_tables:
+                if self.changes[table_name] and table_program_ids[table_name]:
+                    relation = Program._meta.get_field(table_name)
+                    values = dict(self.changes[table_name])
+                    if any(field.name == 'date_modified' for field in relation.related_model._meta.concrete_fields):
+                        values['date_modified'] = now
+                    relation.related_model.objects\
+                        .filter(**{relation.field.name + '__in': table_program_ids[table_name]})\
+                        .update(**values)
+
+            # update program's date_modified and modified_by, and add batch update information to history.
+            if changed_programs:
+                values = dict(self.changes.get('program', {}))
+                values.update(modified_by=self.user, date_modified=now)
+                Program.objects.filter(pk__in=[program.pk for program, _ in changed_programs]).update(**values)
+
+                content_type_id = ContentType.objects.get_for_model(Program).pk
+                log_entries = []
+                for program, updated_attrs in changed_programs:
+                    for attribute, value in values.items():
+                        setattr(program, attribute, value)
+                    log_entries.append(LogEntry(
+                        user_id=self.user.id,
+                        content_type_id=content_type_id,
+                        object_id=force_text(program.pk),
+                        object_repr=force_text(program)[:200],
+                        action_flag=CHANGE,
+                        change_message="batch update: {0}".format(", ".join(updated_attrs))))
+                LogEntry.objects.bulk_create(log_entries)
+        return results
+
+
+class RequestPermissions(object):
+    """
+    Group membership and permission checks of one request.
+    Groups are loaded with one query, and permission results are memoized, so change_view,
+    get_inline_instances, save_model and the batch update action share them.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.groups = None
+        self.results = {}
+
+    @classmethod
+    def for_request(cls, request):
+        permissions = getattr(request, '_request_permissions', None)
+        if permissions is None or permissions.user is not request.user:
+            permissions = cls(request.user)
+            request._request_permissions = permissions
+        return permissions
+
+    def in_group(self, *group_names):
+        """
+        :return: True if user is in any of group_names
+        """
+        if self.groups is None:
+            self.groups = set(self.user.groups.values_list('name', flat=True))
+        return any(group_name in self.groups for group_name in group_names)
+
+    def memoize(self, key, check):
+        """
+        :param key: hashable key of the permission check, e.g. ('change', object pk)
+        :param check: callable that runs the permission check
+        :return: result of check, which only runs on first call
+        """
+        if key not in self.results:
+            self.results[key] = check()
+        return self.results[key]
+
+
 class SaveFormsetMixin(object):
     def save_formset(self, request, form, formset, change):
         """
         Automatically create or delete WebPage for webtracking
         """
-        instances = formset.save(commit=False)
-        for obj in formset.deleted_objects:
-            if isinstance(obj, NonDegreeCourseURL) or isinstance(obj, NonDegreeCategoryURL):
-                category_urls = NonDegreeCategoryURL.objects.filter(url=obj.url)
-                course_urls = NonDegreeCourseURL.objects.filter(url=obj.url)
-                program_urls = WebPageProgramMap.objects.filter(webpage__url=obj.url)
-                len_of_category_urls = category_urls.count()
-                len_of_course_urls = course_urls.count()
-                len_of_program_urls = program_urls.count()
-                if len_of_category_urls + len_of_course_urls + len_of_program_urls == 1:
-                    try:
-                        web_page = WebPage.objects.get(url=obj.url)
-                    except WebPage.DoesNotExist:
-                        web_page = None
-                    if web_page is not None:
-                        web_page.delete()
-            obj.delete()
-        for instance in instances:
-            if isinstance(instance, NonDegreeCourseURL) or isinstance(instance, NonDegreeCategoryURL):
-                web_page, created = WebPage.objects.get_or_create(url=instance.url)
-                instance.webpage = web_page
-            instance.save()
+        formset.save(commit=False)
+        deleted_urls = [obj.url for obj in formset.deleted_objects
+                        if isinstance(obj, NonDegreeCourseURL) or isinstance(obj, NonDegreeCategoryURL)]
+        if formset.deleted_objects:
+            formset.model.objects.filter(pk__in=[obj.pk for obj in formset.deleted_objects]).delete()
+        # delete WebPages that are not used by any URL any more
+        delete_orphan_web_pages(deleted_urls)
+
+        new_objects = list(formset.new_objects)
+        changed_fields = OrderedDict()
+        for obj, changed_data in formset.changed_objects:
+            changed_fields[obj] = set(changed_data)
+        instances = new_objects + list(changed_fields)
+
+        # resolve all WebPages with one query plus one bulk insert
+        url_instances = [instance for instance in instances
+                         if isinstance(instance, NonDegreeCourseURL) or isinstance(instance, NonDegreeCategoryURL)]
+        if url_instances:
+            webpage_ids = web_tracking.register((instance.url for instance in url_instances), verify=True)
+            for instance in url_instances:
+                instance.webpage_id = webpage_ids[normalize_url(instance.url)]
+                if instance in changed_fields:
+                    changed_fields[instance].add('webpage')
+
+        if new_objects:
+            formset.model.objects.bulk_create(new_objects)
+        if changed_fields:
+            model_fields = set(field.name for field in formset.model._meta.concrete_fields
+                               if not field.primary_key)
+            update_fields = set.union(*changed_fields.values()) & model_fields
+            if 'date_modified' in model_fields:
+                now = timezone.now()
+                for instance in changed_fields:
+                    instance.date_modified = now
+                update_fields.add('date_modified')
+            if update_fields:
+                formset.model.objects.bulk_update(list(changed_fields), sorted(update_fields))
         formset.save_m2m()
 
 
@@ -113,13 +301,7 @@ class ProgramAdmin(AutoUserModelAdmin):
 
     list_filter = ('date_modified', 'discontinued', 'created_by', 'modified_by', 'degree__master')
 
-    tracking_url_fields = ['url', 'homepage_url', 'additional_url', 'parent_handbook_url', 'program_faq_url',
-                           'stats_profile_url', 'admission_stats_parent_url', 'job_placement_url',
-                           'job_placement_parent_url', 'part_time_url', 'nitty_gritty_degree_duration_program_url',
-                           'curriculum_url', 'transfer_unit_url', 'thesis_url', 'dissertation_url',
-                           'university_cost_url', 'school_cost_url', 'deadline_url', 'program_req_url',
-                           'school_req_url', 'intl_req_url', 'scholarship_program_specific_url',
-                           'scholarship_general_url']
+    tracking_url_fields = PROGRAM_TRACKING_URL_FIELDS
     search_fields = [
         'object_id',
         'university_school__ceeb',
@@ -189,7 +371,9 @@ class ProgramAdmin(AutoUserModelAdmin):
         }),
     ]
 
-    actions = ['set_update_action']
+    actions = ['set_update_action', 'export_csv_action', 'export_jsonl_action']
+    batch_update_background_threshold = 2000    # bigger batch updates always run as a background job
+    batch_update_chunk_size = 500
 
     def set_update_action(self, request, queryset):
         """
@@ -198,43 +382,41 @@ class ProgramAdmin(AutoUserModelAdmin):
         """
 
         # permission checking
-        if not request.user.groups.filter(name=GROUP_CAN_BATCH_UPDATE):
+        if not RequestPermissions.for_request(request).in_group(GROUP_CAN_BATCH_UPDATE):
             messages.error(request, "Permission denied!")
             return
 
-        def batch_update_save(table_change, attrs_list, saved_form, updated_attributes):
-            for attribute in attrs_list:
-                if attribute in request.POST:
-                    new_value = saved_form.cleaned_data[attribute]
-                    setattr(table_change, attribute, new_value)
-                    table_change.save()
-                    updated_attributes.append(attribute)
-
-        form_name_dict = {'program_form': 'program',
-                          'duration_form': 'duration',
-                          'curriculum_form': 'curriculum',
-                          'tuition_form': 'tuition',
-                          'deadline_form': 'deadline',
-                          'requirement_form': 'requirement',
-                          'scholarship_form': 'scholarship', }
-        form_dict = {'program_form': ProgramForm,
-                     'duration_form': DurationForm,
-                     'curriculum_form': CurriculumForm,
-                     'tuition_form': TuitionForm,
-                     'deadline_form': DeadlineForm,
-                     'requirement_form': RequirementForm,
-                     'scholarship_form': ScholarshipForm, }
-        form_attrs_dict = {'program_form': BATCH_UPDATE_PROGRAM,
-                           'duration_form': BATCH_UPDATE_DURATION,
-                           'curriculum_form': BATCH_UPDATE_CURRICULUM,
-                           'tuition_form': BATCH_UPDATE_TUITION,
-                           'deadline_form': BATCH_UPDATE_DEADLINE,
-                           'requirement_form': BATCH_UPDATE_REQUIREMENT,
-                           'scholarship_form': BATCH_UPDATE_SCHOLARSHIP, }
+        form_name_dict = BATCH_UPDATE_FORM_TABLES
+        form_dict = BATCH_UPDATE_FORMS
+        form_attrs_dict = BATCH_UPDATE_FORM_ATTRS
 
+        # load every related table with the programs, so checking which tables exist doesn't query per program.
+        queryset = queryset.select_related(*[table_name for table_name in form_name_dict.values()
+                                             if table_name != 'program'])
         data = {'title': u'Update',
                 'objects': queryset}
 
+        # save data to all program
+        if 'save' in request.POST and 'select_action' not in request.POST:
+            # large batches are applied in chunks by the background job queue.
+            if 'run_in_background' in request.POST or queryset.count() > self.batch_update_background_threshold:
+                job = batch_update_jobs.submit(request.user, request.POST, queryset.values_list('pk', flat=True),
+                                               chunk_size=self.batch_update_chunk_size)
+                messages.info(request, 'Batch update job {0} started.'.format(job.object_id))
+                return HttpResponseRedirect(reverse('admin:{0}_{1}_batch_update_job'.format(
+                    self.model._meta.app_label, self.model._meta.model_name), args=[job.object_id]))
+
+            batch_update = ProgramBatchUpdate(request.user, request.POST)
+            for program, updated_forms, not_updated_forms in batch_update.apply(queryset):
+                # displaying success or error messages.
+                update_str = 'For program {0}, updated: {1}'.format(program.object_id, ", ".join(updated_forms))
+                messages.success(request, update_str)
+                if not_updated_forms:
+                    not_update_str = 'For program {0}, can not update: {1}. Please create them first.'\
+                        .format(program.object_id, ", ".join(not_updated_forms))
+                    messages.error(request, not_update_str)
+            return
+
         # displaying 'table not created' error.
         error_message_list = []
         for program in queryset:
@@ -254,49 +436,6 @@ class ProgramAdmin(AutoUserModelAdmin):
                 if request.POST.get(form_name, '') == form_name:
                     data[form_name] = form()
 
-        # save data to all program
-        elif 'save' in request.POST:
-            for program in queryset:
-                updated_forms = []
-                not_updated_forms = []
-                updated_attrs = []
-                for form_name, form in form_dict.items():
-                    if request.POST.get(form_name) == form_name:
-                        save_form = form(request.POST)
-                        if form_name == "program_form" and save_form.is_valid():
-                            table = program
-                            batch_update_save(table, form_attrs_dict[form_name], save_form, updated_attrs)
-                            updated_forms.append(form_name_dict[form_name])
-                        elif hasattr(program, form_name_dict[form_name]) and save_form.is_valid():
-                            table = getattr(program, form_name_dict[form_name])
-                            batch_update_save(table, form_attrs_dict[form_name], save_form, updated_attrs)
-                            updated_forms.append(form_name_dict[form_name])
-                        else:
-                            not_updated_forms.append(form_name_dict[form_name])
-
-                # update program's date_modified and modified_by, and add batch update information to history.
-                if updated_attrs:
-                    program.modified_by = request.user
-                    program.date_modified = datetime.now()
-                    program.save()
-                    history_message = "batch update: {0}".format(", ".join(updated_attrs))
-                    LogEntry.objects.log_action(
-                        user_id=request.user.id,
-                        content_type_id=ContentType.objects.get_for_model(program).pk,
-                        object_id=program.pk,
-                        object_repr=force_text(program),
-                        action_flag=CHANGE,
-                        change_message=history_message)
-
-                # displaying success or error messages.
-                update_str = 'For program {0}, updated: {1}'.format(program.object_id, ", ".join(updated_forms))
-                messages.success(request, update_str)
-                if not_updated_forms:
-                    not_update_str = 'For program {0}, can not update: {1}. Please create them first.'\
-                        .format(program.object_id, ", ".join(not_updated_forms))
-                    messages.error(request, not_update_str)
-            return
-
         # return confirmation page which showing all programs.
         elif 'confirmation' in request.POST:
             form_edited = {}
@@ -350,6 +489,60 @@ class ProgramAdmin(AutoUserModelAdmin):
 
     set_update_action.short_description = u'Update selected programs'
 
+    def export_programs(self, queryset, file_format, content_type):
+        response = StreamingHttpResponse(ProgramExporter(queryset).lines(file_format), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="programs.{0}"'.format(file_format)
+        return response
+
+    def export_csv_action(self, request, queryset):
+        return self.export_programs(queryset, 'csv', 'text/csv')
+
+    export_csv_action.short_description = u'Export selected programs as CSV'
+
+    def export_jsonl_action(self, request, queryset):
+        return self.export_programs(queryset, 'jsonl', 'application/x-ndjson')
+
+    export_jsonl_action.short_description = u'Export selected programs as JSON lines'
+
+    def get_urls(self):
+        urls = super(ProgramAdmin, self).get_urls()
+        info = self.model._meta.app_label, self.model._meta.model_name
+        job_urls = [
+            url(r'^batch-update-jobs/(?P<job_id>[0-9a-f-]+)/$', self.admin_site.admin_view(self.batch_update_job_view),
+                name='{0}_{1}_batch_update_job'.format(*info)),
+        ]
+        return job_urls + urls
+
+    def batch_update_job_view(self, request, job_id):
+        """
+        Progress page of a background batch update job.
+        The page polls this view with ?format=json, and a failed job can be resumed by posting 'resume'.
+        """
+        if not RequestPermissions.for_request(request).in_group(GROUP_CAN_BATCH_UPDATE):
+            raise PermissionDenied
+        job = batch_update_jobs.get(job_id)
+        if job is None:
+            raise Http404('Batch update job {0} does not exist.'.format(job_id))
+
+        if request.method == 'POST' and 'resume' in request.POST:
+            if batch_update_jobs.resume(job):
+                messages.info(request, 'Batch update job {0} resumed.'.format(job.object_id))
+            return HttpResponseRedirect(request.path)
+
+        if request.GET.get('format') == 'json':
+            return JsonResponse(job.to_dict())
+        data = {'title': u'Batch update progress',
+                'job': job.to_dict()}
+        return render(request, 'admin/ceeb_program/batch_update_job.html', data)
+
+    def get_queryset(self, request):
+        """
+        Load university school, degree, assignment and proof data together with programs, so the changelist
+        columns don't run their own queries for every row.
+        """
+        queryset = super(ProgramAdmin, self).get_queryset(request)
+        return annotate_program_assignment(queryset.select_related('university_school', 'degree'))
+
     def ceeb_code(self, obj):
         return obj.university_school.ceeb
 
@@ -360,14 +553,20 @@ class ProgramAdmin(AutoUserModelAdmin):
         return obj.degree.master
 
     def assignee(self, obj):
+        if hasattr(obj, 'annotated_assignee'):
+            return obj.annotated_assignee
         assignment = ProgramAssignment.objects.get(program=obj)
         return assignment.assignee
 
     def reviewer(self, obj):
+        if hasattr(obj, 'annotated_reviewer'):
+            return obj.annotated_reviewer
         proof = ProgramProof.objects.get(program=obj)
         return proof.reviewer
 
     def assignment_status(self, obj):
+        if hasattr(obj, 'annotated_assignment_status'):
+            return obj.annotated_assignment_status
         assignment = ProgramAssignment.objects.get(program=obj)
         return assignment.status
 
@@ -376,6 +575,8 @@ class ProgramAdmin(AutoUserModelAdmin):
         return assignment.need_update_notes
 
     def review_status(self, obj):
+        if hasattr(obj, 'annotated_review_status'):
+            return obj.annotated_review_status
         proof = ProgramProof.objects.get(program=obj)
         return proof.status
 
@@ -394,6 +595,24 @@ class ProgramAdmin(AutoUserModelAdmin):
 
     ceeb_code.admin_order_field = 'university_school__ceeb'
     degree_name.admin_order_field = 'degree'
+    assignee.admin_order_field = 'annotated_assignee'
+    assignment_status.admin_order_field = 'annotated_assignment_status'
+    reviewer.admin_order_field = 'annotated_reviewer'
+    review_status.admin_order_field = 'annotated_review_status'
+
+    def has_add_permission(self, request):
+        return RequestPermissions.for_request(request).memoize(
+            ('add', None), lambda: super(ProgramAdmin, self).has_add_permission(request))
+
+    def has_change_permission(self, request, obj=None):
+        return RequestPermissions.for_request(request).memoize(
+            ('change', obj.pk if obj is not None else None),
+            lambda: super(ProgramAdmin, self).has_change_permission(request, obj))
+
+    def has_delete_permission(self, request, obj=None):
+        return RequestPermissions.for_request(request).memoize(
+            ('delete', obj.pk if obj is not None else None),
+            lambda: super(ProgramAdmin, self).has_delete_permission(request, obj))
 
     def get_inline_instances(self, request, obj=None):
         """
@@ -417,104 +636,122 @@ class ProgramAdmin(AutoUserModelAdmin):
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
         extra_context = extra_context or {}
-        if request.user.groups.filter(name=GROUP_PROOF_EXPERTS).count():
+        permissions = RequestPermissions.for_request(request)
+        if permissions.in_group(GROUP_PROOF_EXPERTS):
             extra_context['proof_experts'] = True
-        if request.user.groups.filter(name=GROUP_KNOWLEDGE_EXPERTS).count()\
-                or request.user.groups.filter(name=GROUP_KE_VENDORS).count():
+        if permissions.in_group(GROUP_KNOWLEDGE_EXPERTS, GROUP_KE_VENDORS):
             extra_context['knowledge_experts'] = True
         return super(ProgramAdmin, self).change_view(request, object_id, form_url, extra_context=extra_context)
 
-    def add_url_to_web_tracking(self, obj, form_data):
-        url_list = []
-        for url_name in self.tracking_url_fields:
-            if url_name in form_data.keys():
-                url = form_data[url_name]
-                if url:
-                    url_list.append("(uuid_generate_v4(), '{date_created}', '{date_modified}', {revision}, '{url}', "
-                                    "{enabled}, {fetch_error_count})"
-                                    .format(date_created=datetime.utcnow().strftime(TIME_FORMAT),
-                                            date_modified=datetime.utcnow().strftime(TIME_FORMAT),
-                                            revision=0,
-                                            url=url,
-                                            enabled=True,
-                                            fetch_error_count=0))
-        if url_list:
-            value = ','.join(url_list)
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                        CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
-                        INSERT INTO "webtracking_webpage"
-                            ("object_id", "date_created", "date_modified", "revision", "url", "enabled",
-                            "fetch_error_count")
-                            VALUES
-                            {value}
-                            ON CONFLICT DO NOTHING;
-                        """.format(value=value))
+    def get_tracking_urls(self, form_data):
+        """
+        :param form_data: cleaned data of program form or of an inline form
+        :return: a list of non-empty URLs in tracking_url_fields
+        """
+        return [form_data[url_name] for url_name in self.tracking_url_fields if form_data.get(url_name)]
+
+    def check_same_as_links(self, request, form, change):
+        """
+        Warn about same_as_many links that close a cycle, and tell which cluster the program joins.
+        """
+        obj = form.instance
+        linked_ids = set(program.pk for program in form.cleaned_data.get('same_as_many') or [])
+        if change:
+            linked_ids -= set(obj.same_as_many.values_list('pk', flat=True))
+        linked_ids.discard(obj.pk)
+        if not linked_ids:
+            return
+        checked_links = program_clusters.check_links(obj.pk, sorted(linked_ids, key=str))
+        for linked_id, creates_cycle, cluster_size in checked_links:
+            if creates_cycle:
+                messages.warning(request, 'Program {0} is already equivalent to program {1} through other '
+                                          'programs, this link creates a cycle in a cluster of {2} programs.'
+                                 .format(obj.object_id, linked_id, cluster_size))
+        messages.info(request, 'Program {0} is in a cluster of {1} equivalent programs.'
+                      .format(obj.object_id, cluster_size))
 
     def save_formset(self, request, form, formset, change):
-        index = 0
         instances = formset.save(commit=False)
         for obj in formset.deleted_objects:
             obj.delete()
         for instance in instances:
             instance.save()
-            if formset.is_valid():
-                self.add_url_to_web_tracking(obj=instance.program, form_data=formset.cleaned_data[index])
-            index += 1
         formset.save_m2m()
 
-    def save_model(self, request, obj, form, change):
-        if change and form.is_valid():
-            self.add_url_to_web_tracking(obj=obj, form_data=form.cleaned_data)
-
-        try:
-            program_assignment = ProgramAssignment.objects.get(program=obj)
-        except ObjectDoesNotExist:
-            program_assignment = None
+    def save_related(self, request, form, formsets, change):
+        """
+        Register the URLs of program form and of every inline form for web tracking, all at once.
+        """
+        self.check_same_as_links(request, form, change)
+        super(ProgramAdmin, self).save_related(request, form, formsets, change)
+        urls = []
+        if change:
+            urls += self.get_tracking_urls(form.cleaned_data)
+        for formset in formsets:
+            for inline_form in formset.forms:
+                if inline_form not in formset.deleted_forms:
+                    urls += self.get_tracking_urls(getattr(inline_form, 'cleaned_data', {}))
+        web_tracking.register(urls)
 
-        try:
-            program_proof = ProgramProof.objects.get(program=obj)
-        except ObjectDoesNotExist:
-            program_proof = None
+    def save_model(self, request, obj, form, change):
+        """
+        Save program and move its assignment and proof to their next status.
+        Assignment and proof are read once and written once. Emails and audit logs go to the outbox, which
+        sends them after the transaction commits.
+        """
+        program_assignment = None
+        program_proof = None
+        if change:
+            program_assignment = ProgramAssignment.objects.select_related('assignee').filter(program=obj).first()
+            program_proof = ProgramProof.objects.select_related('reviewer').filter(program=obj).first()
+        assignment_changes = {}
+        proof_changes = {}
 
         # auto update assignment status
         if program_assignment:
             if program_assignment.assignee == request.user and program_assignment.status == 'Assigned':
-                ProgramAssignment.objects.update_or_create(program=obj, defaults={'status': 'InProgress'})
+                assignment_changes['status'] = 'InProgress'
 
             assignment_status = request.POST.get('assignment_status', '')  # get assignment_status
             if assignment_status and self.has_change_permission(request, obj):
-                if program_assignment.assignee == request.user or program_proof.reviewer == request.user:
+                if program_assignment.assignee == request.user or \
+                        (program_proof is not None and program_proof.reviewer == request.user):
                     # update assignee status
-                    ProgramAssignment.objects.update_or_create(program=obj, defaults={'status': assignment_status})
+                    assignment_changes['status'] = assignment_status
                     if assignment_status == 'Done':
                         remove_perm('ceeb_program.change_program', request.user, obj)  # remove permission from assignee
-                        audit_logger.info('{0} lost modification permission by finishing assignment of program {1}:{2}'
-                                          .format(request.user.username, obj.object_id, obj))
-                        email_message = "Assignee finished assignment: \n{0}{1} \nAssignee: {2}\nEmail: {3}"\
-                                        .format(get_current_site(request), settings.PROGRAM_URL.format(obj.object_id),
-                                                program_assignment.assignee.username, program_assignment.assignee.email)
-                        send_email(request, 'Assignee finished assignment', email_message,
-                                   [program_proof.reviewer.email])
+                        outbox.add(audit_logger.info,
+                                   '{0} lost modification permission by finishing assignment of program {1}:{2}'
+                                   .format(request.user.username, obj.object_id, obj))
+                        if program_proof is not None and program_proof.reviewer is not None:
+                            email_message = "Assignee finished assignment: \n{0}{1} \nAssignee: {2}\nEmail: {3}"\
+                                .format(get_current_site(request), settings.PROGRAM_URL.format(obj.object_id),
+                                        program_assignment.assignee.username, program_assignment.assignee.email)
+                            outbox.add(send_mail, 'Assignee finished assignment', email_message,
+                                       settings.DEFAULT_FROM_EMAIL, [program_proof.reviewer.email])
+                        else:
+                            logger.warning('Program {0} has no reviewer, finished assignment email is not sent.'
+                                           .format(obj.object_id))
 
                     if assignment_status == "NeedUpdate":  # if assignment need update
                         old_assignee = program_assignment.assignee
                         assign_perm('ceeb_program.change_program', old_assignee, obj)  # assign permission to assignee
-                        audit_logger.info('{0} granted modification permission to {1} for assignment follow up, '
-                                          'for program {2}:{3}.'
-                                          .format(request.user.username, old_assignee.username, obj.object_id, obj))
+                        outbox.add(audit_logger.info,
+                                   '{0} granted modification permission to {1} for assignment follow up, '
+                                   'for program {2}:{3}.'
+                                   .format(request.user.username, old_assignee.username, obj.object_id, obj))
                         email_message = "Received need-update assignment: \n{0}{1} \n"\
                                         .format(get_current_site(request),  settings.PROGRAM_URL.format(obj.object_id))
                         need_update_note = request.POST.get('need_update_note', '')  # get need_update_note
 
                         # if there is need update note, send email to assignee
                         if need_update_note:
-                            ProgramAssignment.objects.update_or_create(program=obj,
-                                                                       defaults={'need_update_notes': need_update_note})
+                            assignment_changes['need_update_notes'] = need_update_note
                             email_message += "Need update note: {0}\n".format(need_update_note)
                         email_message += "Assigned by: {0}\nEmail: {1}".format(request.user.username,
                                                                                request.user.email)
-                        send_email(request, 'Assignment Need Update', email_message, [old_assignee.email])
+                        outbox.add(send_mail, 'Assignment Need Update', email_message, settings.DEFAULT_FROM_EMAIL,
+                                   [old_assignee.email])
                 else:
                     messages.add_message(request, messages.ERROR,
                                          "Only assignee or reviewer can update assignment status.")
@@ -522,19 +759,33 @@ class ProgramAdmin(AutoUserModelAdmin):
         # auto update review status
         if program_proof:
             if program_proof.reviewer == request.user and program_proof.status == 'Assigned':
-                ProgramProof.objects.update_or_create(program=obj, defaults={'status': 'InProgress'})
+                proof_changes['status'] = 'InProgress'
 
             review_status = request.POST.get('review_status', '')  # get review_status
             if review_status and self.has_change_permission(request, obj):
                 if program_proof.reviewer == request.user:
                     # update reviewer status
-                    ProgramProof.objects.update_or_create(program=obj, defaults={'status': review_status})
+                    proof_changes['status'] = review_status
                 else:
                     messages.add_message(request, messages.ERROR, "Only reviewer can update review status.")
 
         super(ProgramAdmin, self).save_model(request, obj, form, change)
+
+        # write assignment and proof, one query each
         if program_assignment is None:
             ProgramAssignment.objects.create(program=obj, status='None')
+        elif assignment_changes:
+            self.update_fields(program_assignment, assignment_changes)
         if program_proof is None:
             ProgramProof.objects.create(program=obj, status='None')
-        return
\ No newline at end of file
+        elif proof_changes:
+            self.update_fields(program_proof, proof_changes)
+
+    @staticmethod
+    def update_fields(instance, changes):
+        for field_name, value in changes.items():
+            setattr(instance, field_name, value)
+        update_fields = list(changes)
+        if any(field.name == 'date_modified' for field in instance._meta.concrete_fields):
+            update_fields.append('date_modified')
+        instance.save(update_fields=update_fields)
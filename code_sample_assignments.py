@@ -0,0 +1,178 @@
+ASSIGNMENT_STATUSES = ('None', 'Assigned', 'InProgress', 'Done', 'NeedUpdate')
+CHANGE_PROGRAM_PERMISSION = 'ceeb_program.change_program'
+
+
+def read_assignment_rows(file, file_format):
+    """
+    Read (program, assignee, reviewer, status) rows from a CSV or JSONL file.
+    :param file: text file object
+    :param file_format: 'csv' or 'jsonl'
+    :return: a list of dict rows
+    """
+    if file_format == 'csv':
+        return list(csv.DictReader(file))
+    if file_format == 'jsonl':
+        return [json.loads(line) for line in file if line.strip()]
+    raise ValueError('Unsupported file format: {0}'.format(file_format))
+
+
+class ProgramAssignmentImport(object):
+    """
+    Bulk program assignment import and status transition.
+    ProgramAssignment and ProgramProof rows are written with bulk_create/bulk_update, guardian object
+    permissions are granted and revoked per user for all of their programs at once, and every assignee and
+    reviewer gets one digest email.
+    """
+
+    def __init__(self, user):
+        """
+        :param user: user who runs the import, saved as modified_by
+        """
+        self.user = user
+
+    def clean_rows(self, rows):
+        """
+        :return: ({program id: (assignee username, reviewer username, status)}, a list of error messages)
+        """
+        cleaned_rows = OrderedDict()
+        errors = []
+        for line, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                errors.append('Row {0}: expected an object with program, assignee, reviewer and status.'.format(line))
+                continue
+            # JSONL and API rows may hold numbers or other non-string values
+            program_id, assignee, reviewer, status = [
+                six.text_type(value).strip() if value is not None else ''
+                for value in (row.get('program'), row.get('assignee'), row.get('reviewer'), row.get('status'))]
+            status = status or 'Assigned'
+            if not program_id or not assignee:
+                errors.append('Row {0}: program and assignee are required.'.format(line))
+                continue
+            if status not in ASSIGNMENT_STATUSES:
+                errors.append('Row {0}: unknown status {1}.'.format(line, status))
+                continue
+            try:
+                program_id = uuid.UUID(program_id)
+            except ValueError:
+                errors.append('Row {0}: {1} is not a program object_id.'.format(line, program_id))
+                continue
+            cleaned_rows[program_id] = (assignee, reviewer, status)     # the last row of a program wins
+        return cleaned_rows, errors
+
+    def apply(self, rows):
+        """
+        :param rows: iterable of dicts with program, assignee, reviewer and status
+        :return: a dict of counts, errors and throughput
+        """
+        start_time = time.time()
+        rows = list(rows)
+        cleaned_rows, errors = self.clean_rows(rows)
+
+        programs = Program.objects.in_bulk(list(cleaned_rows))
+        usernames = set(name for assignee, reviewer, status in cleaned_rows.values()
+                        for name in (assignee, reviewer) if name)
+        users = dict((user.username, user) for user in User.objects.filter(username__in=usernames))
+        for program_id, (assignee, reviewer, status) in list(cleaned_rows.items()):
+            missing = [name for name in (assignee, reviewer) if name and name not in users]
+            if program_id not in programs:
+                errors.append('Program {0} does not exist.'.format(program_id))
+                del cleaned_rows[program_id]
+            elif missing:
+                errors.append('Program {0}: unknown user {1}.'.format(program_id, ", ".join(missing)))
+                del cleaned_rows[program_id]
+
+        assignments = dict((assignment.program_id, assignment) for assignment in
+                           ProgramAssignment.objects.select_related('assignee')
+                           .filter(program__in=list(cleaned_rows)))
+        proofs = dict((proof.program_id, proof) for proof in
+                      ProgramProof.objects.filter(program__in=list(cleaned_rows)))
+
+        now = timezone.now()
+        new_assignments, changed_assignments = [], []
+        new_proofs, changed_proofs = [], []
+        granted = defaultdict(list)     # user: programs that get change permission
+        revoked = defaultdict(list)     # user: programs that lose change permission
+        assignee_digest = defaultdict(list)
+        reviewer_digest = defaultdict(list)
+        for program_id, (assignee_name, reviewer_name, status) in cleaned_rows.items():
+            program = programs[program_id]
+            assignee = users[assignee_name]
+            assignment = assignments.get(program.pk)
+            if assignment is None:
+                new_assignments.append(ProgramAssignment(program=program, assignee=assignee, status=status,
+                                                         created_by=self.user, modified_by=self.user))
+            else:
+                if assignment.assignee_id is not None and assignment.assignee_id != assignee.pk:
+                    revoked[assignment.assignee].append(program)
+                assignment.assignee = assignee
+                assignment.status = status
+                assignment.modified_by = self.user
+                assignment.date_modified = now
+                changed_assignments.append(assignment)
+            if status == 'Done':
+                revoked[assignee].append(program)
+            else:
+                granted[assignee].append(program)
+                assignee_digest[assignee].append((program, status))
+
+            if reviewer_name:
+                reviewer = users[reviewer_name]
+                proof = proofs.get(program.pk)
+                if proof is None:
+                    new_proofs.append(ProgramProof(program=program, reviewer=reviewer, status='Assigned',
+                                                   created_by=self.user, modified_by=self.user))
+                    reviewer_digest[reviewer].append(program)
+                elif proof.reviewer_id != reviewer.pk:
+                    proof.reviewer = reviewer
+                    proof.status = 'Assigned'
+                    proof.modified_by = self.user
+                    proof.date_modified = now
+                    changed_proofs.append(proof)
+                    reviewer_digest[reviewer].append(program)
+
+        with transaction.atomic():
+            ProgramAssignment.objects.bulk_create(new_assignments)
+            ProgramAssignment.objects.bulk_update(changed_assignments,
+                                                  ['assignee', 'status', 'modified_by', 'date_modified'])
+            ProgramProof.objects.bulk_create(new_proofs)
+            ProgramProof.objects.bulk_update(changed_proofs, ['reviewer', 'status', 'modified_by', 'date_modified'])
+            for user, user_programs in revoked.items():
+                remove_perm(CHANGE_PROGRAM_PERMISSION, user,
+                            Program.objects.filter(pk__in=[program.pk for program in user_programs]))
+            for user, user_programs in granted.items():
+                assign_perm(CHANGE_PROGRAM_PERMISSION, user,
+                            Program.objects.filter(pk__in=[program.pk for program in user_programs]))
+            audit_logger.info('{0} imported {1} program assignments, granted modification permission to {2} users '
+                              'and revoked it from {3} users.'
+                              .format(self.user.username, len(cleaned_rows), len(granted), len(revoked)))
+            self.send_digests(assignee_digest, reviewer_digest)
+
+        seconds = time.time() - start_time
+        return {
+            'rows': len(rows),
+            'imported': len(cleaned_rows),
+            'assignments_created': len(new_assignments),
+            'assignments_updated': len(changed_assignments),
+            'proofs_created': len(new_proofs),
+            'proofs_updated': len(changed_proofs),
+            'errors': errors,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(len(rows) / seconds, 1) if seconds else None,
+        }
+
+    def send_digests(self, assignee_digest, reviewer_digest):
+        """
+        Send one email per recipient, after the import commits.
+        """
+        site = Site.objects.get_current()
+        for assignee, assigned in assignee_digest.items():
+            lines = ['{0}{1} ({2})'.format(site, settings.PROGRAM_URL.format(program.object_id), status)
+                     for program, status in assigned]
+            message = "You have {0} program assignments: \n{1}\nAssigned by: {2}\nEmail: {3}"\
+                .format(len(lines), "\n".join(lines), self.user.username, self.user.email)
+            outbox.add(send_mail, 'Program Assignments', message, settings.DEFAULT_FROM_EMAIL, [assignee.email])
+        for reviewer, reviewed in reviewer_digest.items():
+            lines = ['{0}{1}'.format(site, settings.PROGRAM_URL.format(program.object_id)) for program in reviewed]
+            message = "You have {0} programs to review: \n{1}\nAssigned by: {2}\nEmail: {3}"\
+                .format(len(lines), "\n".join(lines), self.user.username, self.user.email)
+            outbox.add(send_mail, 'Program Reviews', message, settings.DEFAULT_FROM_EMAIL, [reviewer.email])
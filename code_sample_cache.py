@@ -0,0 +1,88 @@
+SCHOOL_DATA_VERSION_KEY = 'school-api:data-version'
+
+
+def get_school_data_version():
+    version = cache.get(SCHOOL_DATA_VERSION_KEY)
+    if version is None:
+        cache.add(SCHOOL_DATA_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(SCHOOL_DATA_VERSION_KEY)
+    return version
+
+
+def bump_school_data_version():
+    """
+    Invalidate every cached school API response, once the current transaction commits.
+    """
+    transaction.on_commit(lambda: cache.set(SCHOOL_DATA_VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def get_shared_counter(key):
+    """
+    :return: current value of a version counter in the shared cache, which every process sees
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 0, None)
+        version = cache.get(key)
+    return version
+
+
+def increment_shared_counter(key):
+    """
+    :return: the new value of a version counter in the shared cache, incremented atomically
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:      # the key was evicted
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+class CachedResponseMixin(object):
+    """
+    Server-side response cache with ETag support.
+    Responses are cached per view, user scope, query parameters and school data version, and a request with a
+    matching If-None-Match header gets a 304.
+    """
+    cache_timeout = 60 * 60
+
+    def get_cache_scope(self):
+        if self.is_manager():
+            return 'manager'
+        school_ids = UniversitySchool.objects.filter(non_degree_user=self.request.user)\
+            .values_list('object_id', flat=True)
+        return 'schools:' + ','.join(sorted(str(school_id) for school_id in school_ids))
+
+    def get_cache_key(self, request):
+        key = '|'.join([
+            self.__class__.__name__,
+            self.get_cache_scope(),
+            urlencode(sorted(request.query_params.lists()), doseq=True),
+            json.dumps(self.kwargs, sort_keys=True, default=str),
+            get_school_data_version(),
+        ])
+        return 'school-api:' + hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def cached_response(self, request, get_response):
+        """
+        :param get_response: callable that returns the uncached response
+        :return: cached, fresh or 304 response
+        """
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = get_response()
+            if response.status_code != HTTP_200_OK:
+                return response
+            etag = '"{0}"'.format(hashlib.md5(JSONRenderer().render(response.data)).hexdigest())
+            cached = (response.data, etag)
+            cache.set(key, cached, self.cache_timeout)
+
+        data, etag = cached
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in [value.strip().replace('W/', '', 1) for value in if_none_match.split(',')]:
+            response = Response(status=HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data, status=HTTP_200_OK)
+        response['ETag'] = etag
+        return response
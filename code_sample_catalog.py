@@ -0,0 +1,113 @@
+def render_school_categories(school):
+    categories = NonDegreeCategory.objects.filter(university_school=school).filter(active=True)
+    return JSONRenderer().render(CategorySerializer(categories, many=True).data)
+
+
+def build_school_catalog(school):
+    """
+    Render the active catalog of school and save it.
+    The catalog is only saved if nothing marked it stale while it was rendered.
+    :return: NonDegreeSchoolCatalog
+    """
+    catalog = NonDegreeSchoolCatalog.objects.filter(university_school=school).first()
+    data = render_school_categories(school)
+    values = {'categories': data.decode('utf-8'), 'content_hash': hashlib.sha256(data).hexdigest(), 'stale': False}
+    if catalog is None:
+        try:
+            with transaction.atomic():
+                return NonDegreeSchoolCatalog.objects.create(university_school=school, **values)
+        except IntegrityError:
+            catalog = NonDegreeSchoolCatalog.objects.get(university_school=school)
+    NonDegreeSchoolCatalog.objects.filter(pk=catalog.pk, version=catalog.version)\
+        .update(date_modified=timezone.now(), **values)
+    for field_name, value in values.items():
+        setattr(catalog, field_name, value)
+    return catalog
+
+
+def get_school_catalog(school):
+    """
+    :return: up to date NonDegreeSchoolCatalog of school
+    """
+    catalog = NonDegreeSchoolCatalog.objects.filter(university_school=school).first()
+    if catalog is None or catalog.stale:
+        catalog = build_school_catalog(school)
+    return catalog
+
+
+def rebuild_stale_school_catalog(school_id):
+    catalog = NonDegreeSchoolCatalog.objects.select_related('university_school')\
+        .filter(university_school_id=school_id, stale=True).first()
+    if catalog is not None:
+        build_school_catalog(catalog.university_school)
+
+
+def mark_school_catalogs_stale(school_ids):
+    """
+    Mark catalogs of school_ids stale, and rebuild them on the outbox worker once the current transaction commits.
+    A catalog that is read before its rebuild finishes is rebuilt by get_school_catalog.
+    """
+    school_ids = set(school_id for school_id in school_ids if school_id is not None)
+    if not school_ids:
+        return
+    NonDegreeSchoolCatalog.objects.filter(university_school_id__in=school_ids)\
+        .update(stale=True, version=F('version') + 1)
+    for school_id in school_ids:
+        outbox.add(rebuild_stale_school_catalog, school_id)
+
+
+def create_school_reports(school_ids=None):
+    """
+    Create one NonDegreeReport, and its customer mappings, for each school at once.
+    Catalogs and customers of all schools are loaded with set-based queries, and reports and mappings are
+    inserted with bulk_create.
+    :param school_ids: object_ids of schools, or None for all schools with active categories
+    :return: a list of per-school result dicts, with status created, failed or not_found
+    """
+    schools = UniversitySchool.objects.all()
+    if school_ids is None:
+        schools = schools.filter(nondegreecategory__active=True).distinct()
+    else:
+        schools = schools.filter(object_id__in=school_ids)
+    schools = list(schools)
+
+    catalogs = dict((catalog.university_school_id, catalog) for catalog in
+                    NonDegreeSchoolCatalog.objects.filter(university_school__in=schools, stale=False))
+    customer_field = UniversityCustomer.non_degree_schools.field
+    customer_ids = defaultdict(list)
+    for school_id, customer_id in UniversityCustomer.non_degree_schools.through.objects\
+            .filter(**{customer_field.m2m_reverse_field_name() + '__in': schools})\
+            .values_list(customer_field.m2m_reverse_field_name() + '_id', customer_field.m2m_field_name() + '_id'):
+        customer_ids[school_id].append(customer_id)
+
+    results = []
+    if school_ids is not None:
+        found_ids = set(school.pk for school in schools)
+        for school_id in OrderedDict.fromkeys(school_ids):
+            if school_id not in found_ids:
+                results.append({'school': school_id, 'status': 'not_found', 'error': 'School does not exist.'})
+    reports = []
+    for school in schools:
+        start_time = time.time()
+        try:
+            catalog = catalogs.get(school.pk) or build_school_catalog(school)
+        except Exception as e:
+            logger.exception('Can not build catalog of school {0}'.format(school.pk))
+            results.append({'school': school.pk, 'status': 'failed', 'error': str(e),
+                            'seconds': round(time.time() - start_time, 3)})
+            continue
+        reports.append(NonDegreeReport(school=school, categories=catalog.categories))
+        results.append({'school': school.pk, 'status': 'created', 'customers': len(customer_ids[school.pk]),
+                        'seconds': round(time.time() - start_time, 3)})
+
+    with transaction.atomic():
+        NonDegreeReport.objects.bulk_create(reports)
+        NonDegreeReportCustomerMapping.objects.bulk_create([
+            NonDegreeReportCustomerMapping(report=report, customer_id=customer_id)
+            for report in reports for customer_id in customer_ids[report.school_id]
+        ])
+    report_ids = dict((report.school_id, report.pk) for report in reports)
+    for result in results:
+        if result['status'] == 'created':
+            result['report'] = report_ids[result['school']]
+    return results
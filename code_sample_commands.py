@@ -0,0 +1,168 @@
+class ReconcileWebPagesCommand(BaseCommand):
+    """
+    manage.py reconcile_webpages
+    """
+    help = 'Find WebPages that no category URL, course URL, program map or program tracking URL refers to, ' \
+           'and delete them with --delete.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', dest='delete', default=False,
+                            help='Delete the orphaned WebPages. Without it, only count them.')
+
+    def handle(self, *args, **options):
+        if not options['delete']:
+            self.stdout.write('{0} orphaned WebPages.'.format(orphan_web_pages().count()))
+            return
+        with transaction.atomic():
+            deleted = delete_orphan_web_pages()
+        self.stdout.write(self.style.SUCCESS('Deleted {0} orphaned WebPages.'.format(deleted)))
+
+
+class ImportProgramAssignmentsCommand(BaseCommand):
+    """
+    manage.py import_program_assignments
+    """
+    help = 'Import (program, assignee, reviewer, status) rows from a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file')
+        parser.add_argument('--format', dest='format', choices=['csv', 'jsonl'], default=None,
+                            help='File format. Defaults to the file extension.')
+        parser.add_argument('--user', dest='user', required=True, help='Username saved as modified_by.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('User {0} does not exist.'.format(options['user']))
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        with open(options['path'], encoding='utf-8', newline='') as file:
+            try:
+                rows = read_assignment_rows(file, file_format)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        result = ProgramAssignmentImport(user).apply(rows)
+        for error in result['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {imported} of {rows} rows in {seconds}s ({rows_per_second} rows/s): '
+            '{assignments_created} assignments created, {assignments_updated} updated, '
+            '{proofs_created} proofs created, {proofs_updated} updated.'.format(**result)))
+
+
+class CreateSchoolReportsCommand(BaseCommand):
+    """
+    manage.py create_school_reports
+    """
+    help = 'Create non-degree reports for the given schools, or for all schools with active categories.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('schools', nargs='*', help='School object_ids. Defaults to all schools with active '
+                                                       'categories.')
+
+    def handle(self, *args, **options):
+        try:
+            school_ids = [uuid.UUID(school_id) for school_id in options['schools']]
+        except ValueError as e:
+            raise CommandError('Invalid school object_id: {0}'.format(e))
+        start_time = time.time()
+        results = create_school_reports(school_ids or None)
+        for result in results:
+            if result['status'] == 'created':
+                self.stdout.write('{school}: report {report}, {customers} customers, {seconds}s'.format(**result))
+            else:
+                self.stderr.write('{school}: {status}, {error}'.format(**result))
+        self.stdout.write(self.style.SUCCESS('Created {0} reports in {1:.3f}s.'.format(
+            len([result for result in results if result['status'] == 'created']), time.time() - start_time)))
+
+
+class UpdateCourseSearchVectorsCommand(BaseCommand):
+    """
+    manage.py update_course_search_vectors
+    """
+    help = 'Recompute the full-text search vector of every non-degree course and university school.'
+
+    def handle(self, *args, **options):
+        update_school_search_vectors()
+        update_course_search_vectors()
+        self.stdout.write(self.style.SUCCESS('Updated search vectors.'))
+
+
+class BenchmarkCourseSearchCommand(BaseCommand):
+    """
+    manage.py benchmark_course_search
+    """
+    help = 'Compare the n-gram index with OR-ed icontains lookups for multiple_search on non-degree courses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='+', help='Search terms.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--generated', type=int, default=0,
+                            help='Benchmark on this many generated names instead of the database.')
+
+    def handle(self, *args, **options):
+        if options['generated']:
+            result = benchmark_ngram_index(options['generated'], options['terms'], options['repeat'])
+            self.stdout.write('{size} names: index built in {build_seconds:.3f}s, index search '
+                              '{index_seconds:.5f}s, scan {scan_seconds:.5f}s'.format(**result))
+            return
+
+        start_time = time.time()
+        course_name_index.rebuild()
+        self.stdout.write('Index built in {0:.3f}s: {1}'.format(time.time() - start_time, course_name_index.stats()))
+
+        query = reduce(operator.or_, [models.Q(name__icontains=term) for term in options['terms']])
+        start_time = time.time()
+        for _ in range(options['repeat']):
+            icontains_count = len(list(NonDegreeCourse.objects.filter(query).values_list('pk', flat=True)))
+        icontains_seconds = (time.time() - start_time) / options['repeat']
+
+        start_time = time.time()
+        for _ in range(options['repeat']):
+            pks = set()
+            for term in options['terms']:
+                pks |= course_name_index.search(term)
+            index_count = len(list(NonDegreeCourse.objects.filter(pk__in=pks).values_list('pk', flat=True)))
+        index_seconds = (time.time() - start_time) / options['repeat']
+
+        self.stdout.write('icontains: {0} courses in {1:.5f}s, n-gram index: {2} courses in {3:.5f}s'
+                          .format(icontains_count, icontains_seconds, index_count, index_seconds))
+
+
+class SameAsClustersCommand(BaseCommand):
+    """
+    manage.py same_as_clusters
+    """
+    help = 'Report clusters of equivalent programs linked by same_as_many, and their redundant links.'
+
+    def handle(self, *args, **options):
+        clusters = sorted(program_clusters.clusters(), key=lambda cluster: -len(cluster['programs']))
+        for cluster in clusters:
+            self.stdout.write('{0} programs, {1} redundant links: {2}'.format(
+                len(cluster['programs']), cluster['redundant_links'],
+                ", ".join(str(program_id) for program_id in cluster['programs'])))
+        self.stdout.write(self.style.SUCCESS('{0} clusters, {1} with cycles.'.format(
+            len(clusters), len([cluster for cluster in clusters if cluster['redundant_links']]))))
+
+
+class ExportProgramsCommand(BaseCommand):
+    """
+    manage.py export_programs
+    """
+    help = 'Stream all programs with their related tables and assignment status as CSV or JSON lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', dest='output', default=None, help='Output file. Defaults to stdout.')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        exporter = ProgramExporter(Program.objects.all(), chunk_size=options['chunk_size'])
+        if options['output'] is None:
+            for line in exporter.lines(options['format']):
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+            for line in exporter.lines(options['format']):
+                file.write(line)
@@ -0,0 +1,77 @@
+class Echo(object):
+    """
+    File-like object for csv.writer that returns the written line instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ProgramExporter(object):
+    """
+    Streaming export of programs with their related tables and assignment and proof status.
+    Programs are read through a server-side cursor in chunks of chunk_size, with related tables joined by
+    select_related and assignment and proof status annotated, so memory use doesn't grow with the export.
+    """
+    related_tables = ('duration', 'curriculum', 'tuition', 'deadline', 'requirement', 'scholarship')
+    assignment_columns = (('assignee', 'annotated_assignee'),
+                          ('assignment_status', 'annotated_assignment_status'),
+                          ('reviewer', 'annotated_reviewer'),
+                          ('review_status', 'annotated_review_status'))
+
+    def __init__(self, queryset, chunk_size=2000):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.tables = [(None, Program)] + [(table_name, Program._meta.get_field(table_name).related_model)
+                                           for table_name in self.related_tables]
+
+    def get_table_fields(self, table_name, model):
+        if table_name is None:
+            return list(model._meta.concrete_fields)
+        relation = Program._meta.get_field(table_name)
+        return [field for field in model._meta.concrete_fields if field.name != relation.field.name]
+
+    def get_columns(self):
+        columns = []
+        for table_name, model in self.tables:
+            for field in self.get_table_fields(table_name, model):
+                columns.append(field.attname if table_name is None else '{0}.{1}'.format(table_name, field.attname))
+        return columns + [column for column, annotation in self.assignment_columns]
+
+    def rows(self):
+        """
+        :return: generator of row dicts, keys are get_columns()
+        """
+        queryset = self.queryset.select_related(*self.related_tables)
+        if 'annotated_assignee' not in queryset.query.annotations:
+            queryset = annotate_program_assignment(queryset)
+        table_fields = [(table_name, self.get_table_fields(table_name, model)) for table_name, model in self.tables]
+
+        for program in queryset.order_by('pk').iterator(chunk_size=self.chunk_size):
+            row = OrderedDict()
+            for table_name, fields in table_fields:
+                table = program if table_name is None else getattr(program, table_name, None)
+                for field in fields:
+                    column = field.attname if table_name is None else '{0}.{1}'.format(table_name, field.attname)
+                    row[column] = getattr(table, field.attname) if table is not None else None
+            for column, annotation in self.assignment_columns:
+                row[column] = getattr(program, annotation)
+            yield row
+
+    def csv_lines(self):
+        writer = csv.writer(Echo())
+        columns = self.get_columns()
+        yield writer.writerow(columns)
+        for row in self.rows():
+            yield writer.writerow(['' if row[column] is None else row[column] for column in columns])
+
+    def jsonl_lines(self):
+        for row in self.rows():
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+    def lines(self, file_format):
+        if file_format == 'csv':
+            return self.csv_lines()
+        if file_format == 'jsonl':
+            return self.jsonl_lines()
+        raise ValueError('Unsupported file format: {0}'.format(file_format))
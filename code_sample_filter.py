@@ -55,6 +55,9 @@ class MultipleSearchFilter(SearchFilter):
     search_title = _('Multiple Search')
     search_description = _('A multiple search term.')
 
+    # more primary keys than this from the n-gram index are filtered in the database instead
+    max_index_results = 30000
+
     def filter_queryset(self, request, queryset, view):
         search_fields = getattr(view, 'multiple_search_fields', None)
         search_terms = self.get_search_terms(request)
@@ -62,6 +65,24 @@ class MultipleSearchFilter(SearchFilter):
         if not search_fields or not search_terms:
             return queryset
 
+        search_vector = getattr(view, 'search_vector', None)
+        if search_vector is not None and connection.vendor == 'postgresql':
+            queryset = full_text_search(queryset, search_vector, search_terms, search_fields, match_all=False,
+                                        rank_name='multiple_search_rank')
+            # this filter runs after OrderingFilter, so it puts its rank in front of the ordering itself
+            if not request.query_params.get(api_settings.ORDERING_PARAM):
+                queryset = queryset.order_by('-multiple_search_rank', *queryset.query.order_by)
+            return queryset
+
+        # resolve terms to primary keys with the in-process n-gram index, and filter with one pk__in
+        search_index = getattr(view, 'multiple_search_index', None)
+        if search_index is not None and search_index.ensure_built():
+            pks = set()
+            for search_term in search_terms:
+                pks |= search_index.search(search_term)
+            if len(pks) <= self.max_index_results:
+                return queryset.filter(pk__in=pks)
+
         orm_lookups = [
             self.construct_search(six.text_type(search_field))
             for search_field in search_fields
@@ -79,3 +100,33 @@ class MultipleSearchFilter(SearchFilter):
         if self.must_call_distinct(queryset, search_fields):
             queryset = distinct(queryset, base)
         return queryset
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Search filter that uses the view's search_vector on PostgreSQL.
+    Every search term has to match, like in SearchFilter, and results are annotated with search_rank.
+    Other databases, or views without search_vector, use SearchFilter's icontains lookups.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = getattr(view, 'search_fields', None)
+        search_vector = getattr(view, 'search_vector', None)
+        search_terms = self.get_search_terms(request)
+
+        if not search_fields or not search_terms or search_vector is None or connection.vendor != 'postgresql':
+            return super(FullTextSearchFilter, self).filter_queryset(request, queryset, view)
+        return full_text_search(queryset, search_vector, search_terms, view.search_substring_fields,
+                                match_all=True, rank_name='search_rank')
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """
+    Ordering filter that orders full-text search results by search_rank first, unless ordering is requested.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super(RankedOrderingFilter, self).get_ordering(request, queryset, view)
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            return ['-search_rank'] + list(ordering or [])
+        return ordering
@@ -71,6 +71,8 @@ class NonDegreeCourse(AbstractDatedObject):
     version = models.PositiveIntegerField(null=False, default=1)
     effective_date_start = models.DateTimeField(blank=True, null=True)
     effective_date_end = models.DateTimeField(blank=True, null=True)
+    # course name, school name, CEEB code and university name, maintained by update_course_search_vectors
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta(AbstractDatedObject.Meta):
         ordering = [
@@ -83,6 +85,8 @@ class NonDegreeCourse(AbstractDatedObject):
         indexes = [
             models.Index(fields=['name', 'active', 'university_school']),
             models.Index(fields=['name', 'university_school', 'type']),
+            GinIndex(fields=['search_vector']),
+            GinIndex(fields=['name'], name='nondegreecourse_name_trgm', opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
@@ -142,3 +146,84 @@ class NonDegreeCourseDate(AbstractDatedObject):
 
     def __str__(self):
         return "{0}-{1}".format(self.start_date, self.end_date)
+
+
+class NonDegreeSchoolCatalog(models.Model):
+    """
+    Materialized active catalog of a school: the rendered CategorySerializer data of its active categories.
+    It is marked stale when a category, course, course date or URL of the school changes, and rebuilt after
+    the change commits, or on next read.
+    """
+    university_school = models.OneToOneField(UniversitySchool, on_delete=models.CASCADE, primary_key=True,
+                                             related_name='active_catalog')
+    categories = models.TextField()
+    content_hash = models.CharField(max_length=64)
+    stale = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)
+    date_modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "{0}".format(self.university_school)
+
+
+class UniversitySchoolSearchDocument(models.Model):
+    """
+    Full-text search vector of a school: school name, CEEB code and university name, maintained by
+    update_school_search_vectors. UniversitySchool is defined outside this app, so the vector has its own table.
+    """
+    university_school = models.OneToOneField(UniversitySchool, on_delete=models.CASCADE, primary_key=True,
+                                             related_name='search_document')
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector']),
+        ]
+
+    def __str__(self):
+        return "{0}".format(self.university_school)
+
+
+class ProgramBatchUpdateJob(AbstractDatedObject):
+    """
+    A background batch update of programs. The posted update form and the chunks of program ids are stored as
+    JSON, and next_chunk is written in the same transaction as the chunk it counts, so any worker process can
+    report the progress and a failed or interrupted job resumes from the first chunk that was not committed.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    DONE = 'done'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+        (DONE, 'Done'),
+    )
+
+    object_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    data = models.TextField()                   # posted batch update form, {name: [values]}
+    chunks = models.TextField()                 # program ids, one list per transaction
+    next_chunk = models.PositiveIntegerField(default=0)
+    chunk_results = models.TextField(default='[]')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+
+    def get_data(self):
+        data = QueryDict(mutable=True)
+        for name, values in json.loads(self.data).items():
+            data.setlist(name, values)
+        return data
+
+    def to_dict(self):
+        chunks = json.loads(self.chunks)
+        return {
+            'job_id': str(self.object_id),
+            'status': self.status,
+            'total_chunks': len(chunks),
+            'committed_chunks': self.next_chunk,
+            'total_programs': sum(len(chunk) for chunk in chunks),
+            'chunk_results': json.loads(self.chunk_results),
+        }
+
+    def __str__(self):
+        return "{0}".format(self.object_id)
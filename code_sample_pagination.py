@@ -0,0 +1,127 @@
+class KeysetPaginationMixin(object):
+    """
+    Opt-in keyset (cursor) pagination for an offset pagination class.
+    With ?paging=cursor, or a cursor, pages are read in the view's default ordering plus object_id as unique
+    tie-breaker, by filtering past the last row of the previous page. No COUNT(*) query is run and deep pages
+    cost the same as the first one.
+    Relations in the ordering are compared by their key (e.g. school is ordered by school_id), and the
+    ordering fields must not be null.
+    A requested ?ordering= can't be combined with a cursor and is rejected. A queryset that filters ordered
+    differently, e.g. by search rank, is paged by offset.
+    """
+    paging_query_param = 'paging'
+    cursor_query_param = 'cursor'
+    ordering_query_param = api_settings.ORDERING_PARAM
+    tie_breaker = 'object_id'
+
+    def use_keyset(self, request):
+        return request.query_params.get(self.paging_query_param) == 'cursor' or \
+            self.cursor_query_param in request.query_params
+
+    def has_default_ordering(self, queryset, view):
+        """
+        :return: True if queryset is unordered or ordered by the view's default ordering only
+        """
+        return list(queryset.query.order_by) in ([], list(getattr(view, 'ordering', None) or ()))
+
+    def get_keyset_ordering(self, queryset, view):
+        ordering = []
+        for field in getattr(view, 'ordering', None) or ():
+            name = field.lstrip('-')
+            if LOOKUP_SEP not in name:
+                model_field = queryset.model._meta.get_field(name)
+                if model_field.is_relation:
+                    field = field.replace(name, model_field.attname)
+            ordering.append(field)
+        if self.tie_breaker not in [field.lstrip('-') for field in ordering]:
+            ordering.append(self.tie_breaker)
+        return ordering
+
+    def get_keyset_page_size(self, request):
+        if hasattr(self, 'get_page_size'):
+            return self.get_page_size(request)
+        return self.get_limit(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if self.keyset and request.query_params.get(self.ordering_query_param):
+            raise ValidationError({self.ordering_query_param: 'Cursor paging only supports the default ordering.'})
+        if self.keyset and not self.has_default_ordering(queryset, view):
+            self.keyset = False
+        if not self.keyset:
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = self.get_keyset_ordering(queryset, view)
+        page_size = self.get_keyset_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+        results = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        self.next_position = self.get_position(results[page_size - 1]) if len(results) > page_size else None
+        return results[:page_size]
+
+    def get_keyset_filter(self, position):
+        """
+        Rows after position: (a > x) or (a = x and b > y) or (a = x and b = y and c > z) ...
+        """
+        keyset_filter = Q()
+        for i, field in enumerate(self.ordering):
+            condition = Q(**{field.lstrip('-') + ('__lt' if field.startswith('-') else '__gt'): position[i]})
+            for previous_field, previous_value in zip(self.ordering[:i], position[:i]):
+                condition &= Q(**{previous_field.lstrip('-'): previous_value})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip('-').split(LOOKUP_SEP):
+                value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position, default=str).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        return position
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super(KeysetPaginationMixin, self).get_next_link()
+        if self.next_position is None:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param,
+                                  self.encode_cursor(self.next_position))
+        return replace_query_param(url, self.paging_query_param, 'cursor')
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super(KeysetPaginationMixin, self).get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class UniversitySchoolKeysetPagination(KeysetPaginationMixin, UniversitySchoolPagination):
+    pass
+
+
+class ReportKeysetPagination(KeysetPaginationMixin, ReportPagination):
+    pass
+
+
+class CourseKeysetPagination(KeysetPaginationMixin, BasePagination):
+    pass
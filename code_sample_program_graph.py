@@ -0,0 +1,150 @@
+def same_as_edges():
+    """
+    :return: iterator of (program id, program id) pairs of Program.same_as_many
+    """
+    field = Program.same_as_many.field
+    return Program.same_as_many.through.objects\
+        .values_list(field.m2m_field_name() + '_id', field.m2m_reverse_field_name() + '_id').iterator()
+
+
+PROGRAM_CLUSTERS_VERSION_KEY = 'program-clusters:version'
+
+
+class ProgramClusterIndex(object):
+    """
+    In-memory union-find index of Program.same_as_many links.
+    It answers which cluster of equivalent programs a program belongs to, and whether a new link closes a
+    cycle, in near-constant time. Added links are applied by m2m_changed signals once their transaction commits.
+    Union-find can't split a cluster, so a removed link marks the index stale and it is rebuilt, in one pass, on
+    next use.
+    Every committed link change increments a version counter in the shared cache. A process whose index was built
+    from the previous version applies its own added links in place and takes the new version. Any other index
+    sees a version it didn't build from and is rebuilt on next use.
+    """
+
+    def __init__(self, version_key=PROGRAM_CLUSTERS_VERSION_KEY):
+        self.parent = {}
+        self.size = {}
+        self.built = False
+        self.version_key = version_key
+        self.version = None     # shared version the index is up to date with
+        self.lock = threading.RLock()
+
+    def get_shared_version(self):
+        return get_shared_counter(self.version_key)
+
+    def bump_shared_version(self):
+        return increment_shared_counter(self.version_key)
+
+    def find(self, program_id):
+        parent = self.parent
+        if program_id not in parent:
+            return program_id
+        while parent[program_id] != program_id:
+            parent[program_id] = parent[parent[program_id]]      # path halving
+            program_id = parent[program_id]
+        return program_id
+
+    def union(self, program_id, other_id):
+        """
+        :return: False if both programs were already in the same cluster
+        """
+        for node in (program_id, other_id):
+            if node not in self.parent:
+                self.parent[node] = node
+                self.size[node] = 1
+        root = self.find(program_id)
+        other_root = self.find(other_id)
+        if root == other_root:
+            return False
+        if self.size[root] < self.size[other_root]:
+            root, other_root = other_root, root
+        self.parent[other_root] = root
+        self.size[root] += self.size.pop(other_root)
+        return True
+
+    def build(self):
+        with self.lock:
+            # read the version first, so a change made while building triggers another build
+            self.version = self.get_shared_version()
+            self.parent = {}
+            self.size = {}
+            for program_id, other_id in same_as_edges():
+                self.union(program_id, other_id)
+            self.built = True
+
+    def ensure_built(self):
+        with self.lock:
+            if not self.built or self.version != self.get_shared_version():
+                self.build()
+
+    def mark_stale(self):
+        """
+        Rebuild every index on next use, once the current transaction commits.
+        """
+        transaction.on_commit(self.apply_removed_links)
+
+    def apply_removed_links(self):
+        with self.lock:
+            self.bump_shared_version()
+            self.built = False
+
+    def add_links(self, program_id, other_ids):
+        """
+        Add links to the index once the current transaction commits, so a rolled back save leaves no trace.
+        """
+        other_ids = list(other_ids)
+        transaction.on_commit(lambda: self.apply_added_links(program_id, other_ids))
+
+    def apply_added_links(self, program_id, other_ids):
+        with self.lock:
+            version = self.bump_shared_version()
+            if self.built and self.version == version - 1:
+                # no other change since the index was up to date, so it only misses these links
+                for other_id in other_ids:
+                    self.union(program_id, other_id)
+                self.version = version
+
+    def cluster_size(self, program_id):
+        with self.lock:
+            self.ensure_built()
+            return self.size.get(self.find(program_id), 1)
+
+    def check_links(self, program_id, other_ids):
+        """
+        Check new links of program_id, in order, without changing the index
+        :return: a list of (other id, True if the link closes a cycle, size of the cluster after linking)
+        """
+        with self.lock:
+            self.ensure_built()
+            root = self.find(program_id)
+            joined_roots = {root}
+            cluster_size = self.size.get(root, 1)
+            result = []
+            for other_id in other_ids:
+                other_root = self.find(other_id)
+                creates_cycle = other_root in joined_roots
+                if not creates_cycle:
+                    joined_roots.add(other_root)
+                    cluster_size += self.size.get(other_root, 1)
+                result.append((other_id, creates_cycle, cluster_size))
+            return result
+
+    def clusters(self):
+        """
+        Recompute all clusters in one pass over the links, for reports
+        :return: a list of dicts with programs and number of redundant links of every cluster
+        """
+        with self.lock:
+            self.build()
+            clusters = defaultdict(lambda: {'programs': set(), 'links': set()})
+            for program_id, other_id in same_as_edges():
+                cluster = clusters[self.find(program_id)]
+                cluster['programs'].update((program_id, other_id))
+                cluster['links'].add(frozenset((program_id, other_id)))
+        return [{'programs': sorted(cluster['programs'], key=str),
+                 'redundant_links': len(cluster['links']) - (len(cluster['programs']) - 1)}
+                for cluster in clusters.values()]
+
+
+program_clusters = ProgramClusterIndex()
@@ -0,0 +1,305 @@
+SEARCH_CONFIG = 'simple'
+
+
+def update_course_search_vectors(course_ids=None, school_ids=None):
+    """
+    Recompute NonDegreeCourse.search_vector from course name (weight A) and school name, CEEB code and
+    university name (weight B), with one set-based UPDATE.
+    :param course_ids: only update these courses
+    :param school_ids: only update courses of these schools
+    All courses are updated if neither is given. Other databases than PostgreSQL have no search vector.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    course = NonDegreeCourse._meta
+    school = UniversitySchool._meta
+    university_field = school.get_field('university_foreign_key')
+    university = university_field.related_model._meta
+    sql = """
+        UPDATE {course} SET {search_vector} =
+            setweight(to_tsvector(%s, coalesce({course}.{course_name}, '')), 'A') ||
+            setweight(to_tsvector(%s, coalesce({school}.{school_name}::text, '') || ' ' ||
+                                      coalesce({school}.{ceeb}::text, '') || ' ' ||
+                                      coalesce({university}.{university_name}::text, '')), 'B')
+        FROM {school} LEFT JOIN {university} ON {school}.{university_fk} = {university}.{university_pk}
+        WHERE {course}.{course_school} = {school}.{school_pk}
+        """.format(course=qn(course.db_table),
+                   search_vector=qn(course.get_field('search_vector').column),
+                   course_name=qn(course.get_field('name').column),
+                   course_school=qn(course.get_field('university_school').column),
+                   school=qn(school.db_table),
+                   school_pk=qn(school.pk.column),
+                   school_name=qn(school.get_field('school').column),
+                   ceeb=qn(school.get_field('ceeb').column),
+                   university_fk=qn(university_field.column),
+                   university=qn(university.db_table),
+                   university_pk=qn(university.pk.column),
+                   university_name=qn(university.get_field('name').column))
+    params = [SEARCH_CONFIG, SEARCH_CONFIG]
+    if course_ids is not None:
+        sql += " AND {0}.{1} = ANY(%s::uuid[])".format(qn(course.db_table), qn(course.pk.column))
+        params.append([str(course_id) for course_id in course_ids])
+    if school_ids is not None:
+        sql += " AND {0}.{1} = ANY(%s::uuid[])".format(qn(school.db_table), qn(school.pk.column))
+        params.append([str(school_id) for school_id in school_ids])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def update_school_search_vectors(school_ids=None):
+    """
+    Recompute UniversitySchoolSearchDocument.search_vector from school name, CEEB code and university name, with
+    one set-based INSERT ... ON CONFLICT DO UPDATE.
+    :param school_ids: only update these schools, all schools if None
+    Other databases than PostgreSQL have no search vector.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    document = UniversitySchoolSearchDocument._meta
+    school = UniversitySchool._meta
+    university_field = school.get_field('university_foreign_key')
+    university = university_field.related_model._meta
+    sql = """
+        INSERT INTO {document} ({document_school}, {search_vector})
+        SELECT {school}.{school_pk},
+            to_tsvector(%s, coalesce({school}.{school_name}::text, '') || ' ' ||
+                            coalesce({school}.{ceeb}::text, '') || ' ' ||
+                            coalesce({university}.{university_name}::text, ''))
+        FROM {school} LEFT JOIN {university} ON {school}.{university_fk} = {university}.{university_pk}
+        """.format(document=qn(document.db_table),
+                   document_school=qn(document.get_field('university_school').column),
+                   search_vector=qn(document.get_field('search_vector').column),
+                   school=qn(school.db_table),
+                   school_pk=qn(school.pk.column),
+                   school_name=qn(school.get_field('school').column),
+                   ceeb=qn(school.get_field('ceeb').column),
+                   university_fk=qn(university_field.column),
+                   university=qn(university.db_table),
+                   university_pk=qn(university.pk.column),
+                   university_name=qn(university.get_field('name').column))
+    params = [SEARCH_CONFIG]
+    if school_ids is not None:
+        sql += " WHERE {0}.{1} = ANY(%s::uuid[])".format(qn(school.db_table), qn(school.pk.column))
+        params.append([str(school_id) for school_id in school_ids])
+    sql += " ON CONFLICT ({0}) DO UPDATE SET {1} = EXCLUDED.{1}".format(
+        qn(document.get_field('university_school').column), qn(document.get_field('search_vector').column))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def full_text_search(queryset, search_vector, search_terms, substring_fields, match_all, rank_name):
+    """
+    Filter queryset by search terms with a full-text index lookup, and annotate a rank.
+    Every term matches the search vector as a word, or substring_fields with icontains, which a trigram
+    (gin_trgm_ops) index serves.
+    :param search_vector: name of a SearchVectorField, or a SearchVector expression
+    :param match_all: True if every term has to match (SearchFilter), False if any term (MultipleSearchFilter)
+    :param rank_name: name of the rank annotation
+    :return: filtered queryset
+    """
+    if not isinstance(search_vector, six.string_types):
+        queryset = queryset.annotate(**{rank_name + '_vector': search_vector})
+        search_vector = rank_name + '_vector'
+
+    conditions = []
+    search_query = None
+    for search_term in search_terms:
+        term_query = SearchQuery(search_term, config=SEARCH_CONFIG)
+        search_query = term_query if search_query is None else \
+            (search_query & term_query if match_all else search_query | term_query)
+        condition = models.Q(**{search_vector: term_query})
+        for field in substring_fields:
+            condition |= models.Q(**{field + '__icontains': search_term})
+        conditions.append(condition)
+
+    queryset = queryset.filter(reduce(operator.and_ if match_all else operator.or_, conditions))
+    return queryset.annotate(**{rank_name: SearchRank(F(search_vector), search_query)})
+
+
+class NGramIndex(object):
+    """
+    In-process inverted n-gram index over one text field of a model, for databases without full-text search.
+    The index is built lazily on first use and kept in sync by model signals, once their transaction commits.
+    Every committed change increments a version counter in the shared cache, so the indexes of other processes
+    are rebuilt on their next use. It is also rebuilt after max_age seconds to pick up queryset updates, which
+    send no signals. It is not used when the table has more than max_entries rows.
+    """
+
+    def __init__(self, model, field_name, n=3, max_entries=500000, max_age=60 * 10):
+        self.model = model
+        self.field_name = field_name
+        self.n = n
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.version_key = 'ngram-index:{0}.{1}:version'.format(model._meta.label_lower, field_name)
+        self.version = None                 # shared version the index is up to date with
+        self.texts = {}                     # pk: lower-cased text
+        self.postings = defaultdict(set)    # n-gram: pks
+        self.built_at = None
+        self.available = False
+        self.pending = None                 # (pk, text or None if removed) changes made while building
+        self.lock = threading.RLock()
+
+    def grams(self, text):
+        return set(text[i:i + self.n] for i in range(len(text) - self.n + 1))
+
+    def build(self):
+        """
+        Build a new index into local dicts, without holding the lock, and swap it in.
+        Searches keep using the old index meanwhile, and changes that arrive during the build are replayed on
+        the new one. Only one build runs at a time.
+        """
+        with self.lock:
+            if self.pending is not None:
+                return
+            self.pending = []
+        try:
+            # read the version first, so a change made while building triggers another build
+            version = get_shared_counter(self.version_key)
+            texts = {}
+            postings = defaultdict(set)
+            available = self.model.objects.count() <= self.max_entries
+            if available:
+                for pk, text in self.model.objects.values_list('pk', self.field_name).iterator():
+                    text = (text or '').lower()
+                    texts[pk] = text
+                    for gram in self.grams(text):
+                        postings[gram].add(pk)
+            with self.lock:
+                self.texts = texts
+                self.postings = postings
+                self.available = available
+                self.built_at = time.time()
+                self.version = version
+                for pk, text in self.pending:
+                    if text is None:
+                        self._remove(pk)
+                    else:
+                        self._add(pk, text)
+        finally:
+            with self.lock:
+                self.pending = None
+
+    def rebuild(self):
+        self.build()
+
+    def ensure_built(self):
+        shared_version = get_shared_counter(self.version_key)
+        with self.lock:
+            if self.built_at is not None and time.time() - self.built_at <= self.max_age and \
+                    self.version == shared_version:
+                return self.available
+        self.build()
+        with self.lock:
+            return self.available
+
+    def object_saved(self, pk, text):
+        """
+        Index a saved object once the current transaction commits.
+        """
+        transaction.on_commit(lambda: self.apply_change(pk, text))
+
+    def object_deleted(self, pk):
+        """
+        Drop a deleted object once the current transaction commits.
+        """
+        transaction.on_commit(lambda: self.apply_change(pk, None))
+
+    def apply_change(self, pk, text):
+        with self.lock:
+            version = increment_shared_counter(self.version_key)
+            if text is None:
+                self.remove(pk)
+            else:
+                self.add(pk, text)
+            if self.version == version - 1:
+                # no other change since the index was up to date, so it only missed this one
+                self.version = version
+
+    def add(self, pk, text):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((pk, text or ''))
+            self._add(pk, text)
+
+    def remove(self, pk):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((pk, None))
+            self._remove(pk)
+
+    def _add(self, pk, text):
+        if self.built_at is None:
+            return
+        self._remove(pk)
+        if len(self.texts) >= self.max_entries:
+            self.available = False
+            return
+        text = (text or '').lower()
+        self.texts[pk] = text
+        for gram in self.grams(text):
+            self.postings[gram].add(pk)
+
+    def _remove(self, pk):
+        text = self.texts.pop(pk, None)
+        if text is None:
+            return
+        for gram in self.grams(text):
+            self.postings[gram].discard(pk)
+            if not self.postings[gram]:
+                del self.postings[gram]
+
+    def search(self, term):
+        """
+        :return: set of pks whose text contains term, case-insensitively
+        """
+        term = term.lower()
+        with self.lock:
+            if len(term) < self.n:
+                return set(pk for pk, text in self.texts.items() if term in text)
+            posting_lists = sorted((self.postings.get(gram, set()) for gram in self.grams(term)), key=len)
+            candidates = set(posting_lists[0]).intersection(*posting_lists[1:])
+            return set(pk for pk in candidates if term in self.texts[pk])
+
+    def stats(self):
+        with self.lock:
+            return {'available': self.available, 'entries': len(self.texts), 'grams': len(self.postings),
+                    'postings': sum(len(pks) for pks in self.postings.values()), 'built_at': self.built_at}
+
+
+course_name_index = NGramIndex(NonDegreeCourse, 'name')
+
+
+def benchmark_ngram_index(size=100000, terms=('data', 'leader', 'finance', 'ai', 'management'), repeat=5):
+    """
+    Compare NGramIndex with scanning every name for every term, which is what OR-ed icontains lookups do,
+    on generated course names.
+    :return: a dict of build time and average search times in seconds
+    """
+    words = ['data', 'science', 'leadership', 'finance', 'strategy', 'marketing', 'management', 'digital',
+             'health', 'ai', 'executive', 'program', 'negotiation', 'innovation', 'supply', 'chain']
+    random_generator = random.Random(0)
+    names = dict((i, ' '.join(random_generator.choice(words) for _ in range(4))) for i in range(size))
+
+    index = NGramIndex(NonDegreeCourse, 'name', max_entries=size)
+    start_time = time.time()
+    index.built_at = start_time
+    for pk, name in names.items():
+        index.add(pk, name)
+    build_seconds = time.time() - start_time
+
+    start_time = time.time()
+    for _ in range(repeat):
+        index_result = set().union(*[index.search(term) for term in terms])
+    index_seconds = (time.time() - start_time) / repeat
+
+    start_time = time.time()
+    for _ in range(repeat):
+        scan_result = set(pk for pk, name in names.items() if any(term in name.lower() for term in terms))
+    scan_seconds = (time.time() - start_time) / repeat
+
+    assert index_result == scan_result
+    return {'size': size, 'build_seconds': build_seconds, 'index_seconds': index_seconds,
+            'scan_seconds': scan_seconds}
@@ -13,8 +13,10 @@ class UniversitySchoolListSerializer(ModelSerializer):
         return obj.university_foreign_key.name
 
     def get_non_degree_client(self, obj):
-        university_customers = obj.non_degree_user.all()
-        university_customers = university_customers.filter(is_demo=False)
+        university_customers = getattr(obj, 'non_demo_customers', None)  # prefetched by UniversitySchoolListAPI
+        if university_customers is None:
+            university_customers = obj.non_degree_user.all()
+            university_customers = university_customers.filter(is_demo=False)
         return UniversityCustomerSerializer(university_customers, many=True).data
 
 
@@ -33,8 +35,7 @@ class UniversitySchoolDetailSerializer(ModelSerializer):
         return obj.university_foreign_key.name
 
     def get_categories(self, obj):
-        categories = NonDegreeCategory.objects.filter(university_school=obj).filter(active=True)
-        return CategorySerializer(categories, many=True).data
+        return json.loads(get_school_catalog(obj).categories)
 
 
 class NonDegreeReportListSerializer(ModelSerializer):
@@ -65,21 +66,66 @@ class WebPageListSerializer(ModelSerializer):
         fields = ('object_id', 'url', 'last_check_date', 'last_change_date', )
 
 
+def diff_scan_data(start_data, end_data):
+    """
+    Compact delta between two serialized scans.
+    Text values are diffed line by line, other changed values are returned as start and end.
+    :return: a dict of changed field: delta
+    """
+    start_data = start_data or {}
+    end_data = end_data or {}
+    delta = OrderedDict()
+    for field_name in list(start_data) + [field_name for field_name in end_data if field_name not in start_data]:
+        start_value = start_data.get(field_name)
+        end_value = end_data.get(field_name)
+        if start_value == end_value:
+            continue
+        if isinstance(start_value, six.string_types) and isinstance(end_value, six.string_types):
+            delta[field_name] = {'diff': list(difflib.unified_diff(start_value.splitlines(), end_value.splitlines(),
+                                                                   lineterm='', n=0))[2:]}
+        else:
+            delta[field_name] = {'start': start_value, 'end': end_value}
+    return delta
+
+
 class AMPReportDetailSerializer(ModelSerializer):
     """
     AMP report detail serializer
+    With ?mode=diff, start and end scan are replaced by a compact scan_diff, and ?fields= limits the returned
+    fields.
     """
     webpage = SerializerMethodField()
     start_scan = SerializerMethodField()
     end_scan = SerializerMethodField()
+    scan_diff = SerializerMethodField()
     last_report_date_created = SerializerMethodField()
 
+    scan_diff_cache_timeout = 60 * 60 * 24
+
     class Meta:
         model = NonDegreeAMPReport
-        fields = ('webpage', 'start_scan', 'end_scan', 'date_created', 'last_report_date_created',)
+        fields = ('webpage', 'start_scan', 'end_scan', 'scan_diff', 'date_created', 'last_report_date_created',)
+
+    def __init__(self, *args, **kwargs):
+        super(AMPReportDetailSerializer, self).__init__(*args, **kwargs)
+        request = self.context.get('request')
+        query_params = getattr(request, 'query_params', {})
+        self.diff_mode = query_params.get('mode') == 'diff'
+        if self.diff_mode:
+            self.fields.pop('start_scan')
+            self.fields.pop('end_scan')
+        else:
+            self.fields.pop('scan_diff')
+        if query_params.get('fields'):
+            requested_fields = set(field_name.strip() for field_name in query_params['fields'].split(','))
+            for field_name in list(self.fields):
+                if field_name not in requested_fields:
+                    self.fields.pop(field_name)
 
     def get_webpage(self, obj):
         web_page = obj.webpage
+        if self.diff_mode:
+            return WebPageListSerializer(web_page).data
         return WebPageSerializer(web_page).data
 
     def get_start_scan(self, obj):
@@ -94,9 +140,45 @@ class AMPReportDetailSerializer(ModelSerializer):
             return WebPageScanDetailSerializer(end_scan).data
         return None
 
+    def get_scan_diff(self, obj):
+        start_scan = getattr(obj, 'start_scan', None)
+        end_scan = getattr(obj, 'end_scan', None)
+        key = 'amp-scan-diff:{0}:{1}'.format(getattr(start_scan, 'pk', None), getattr(end_scan, 'pk', None))
+        delta = cache.get(key)
+        if delta is None:
+            delta = diff_scan_data(self.get_start_scan(obj), self.get_end_scan(obj))
+            cache.set(key, delta, self.scan_diff_cache_timeout)
+        return delta
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load webpage, start scan and end scan with the reports, and annotate every report with date_created
+        of the previous report of the same webpage.
+        A correlated subquery is used instead of Window(Lag), so the previous report is found even if the
+        queryset filters it out.
+        """
+        queryset = queryset.select_related('webpage', 'start_scan', 'end_scan')
+        last_reports = NonDegreeAMPReport.objects.filter(webpage=OuterRef('webpage'))\
+                                                 .filter(date_created__lt=OuterRef('date_created'))\
+                                                 .order_by('-date_created')
+        return queryset.annotate(last_report_date_created=Subquery(last_reports.values('date_created')[:1]))
+
     def get_last_report_date_created(self, obj):
-        reports = NonDegreeAMPReport.objects.filter(webpage=obj.webpage).filter(date_created__lt=obj.date_created)\
-                                            .order_by('-date_created')
-        if reports:
-            return reports.first().date_created
-        return None
+        if hasattr(obj, 'last_report_date_created'):    # annotated by setup_eager_loading
+            return obj.last_report_date_created
+        return NonDegreeAMPReport.objects.filter(webpage=obj.webpage_id).filter(date_created__lt=obj.date_created)\
+                                         .order_by('-date_created').values_list('date_created', flat=True).first()
+
+
+class ReportBatchCreateSerializer(Serializer):
+    """
+    Input of ReportBatchCreateAPI: school object_ids, or all for all schools with active categories.
+    """
+    all = BooleanField(required=False, default=False)
+    schools = ListField(child=UUIDField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if not attrs.get('all') and not attrs.get('schools'):
+            raise ValidationError("School object_ids or 'all' is required.")
+        return attrs
@@ -0,0 +1,111 @@
+@receiver(post_save, sender=WebPage)
+def invalidate_web_page_cache_on_save(sender, instance, **kwargs):
+    web_page_cache.invalidate(url=instance.url, webpage_id=instance.pk)
+
+
+@receiver(post_delete, sender=WebPage)
+def invalidate_web_page_cache_on_delete(sender, instance, **kwargs):
+    web_page_cache.invalidate(url=instance.url, webpage_id=instance.pk)
+
+
+@receiver(post_save, sender=UniversitySchool)
+@receiver(post_delete, sender=UniversitySchool)
+@receiver(post_save, sender=UniversityCustomer)
+@receiver(post_delete, sender=UniversityCustomer)
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+def invalidate_school_api_cache(sender, instance, **kwargs):
+    bump_school_data_version()
+
+
+@receiver(m2m_changed, sender=UniversityCustomer.non_degree_schools.through)
+def invalidate_school_api_cache_on_customer_schools_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_school_data_version()
+
+
+@receiver(post_save, sender=NonDegreeCategory)
+@receiver(post_delete, sender=NonDegreeCategory)
+@receiver(post_save, sender=NonDegreeCourse)
+@receiver(post_delete, sender=NonDegreeCourse)
+def mark_catalog_stale(sender, instance, **kwargs):
+    school_ids = {instance.university_school_id}
+    if isinstance(instance, NonDegreeCourse) and instance.pk is not None:
+        school_ids.update(NonDegreeCategory.objects.filter(nondegreecourse=instance)
+                          .values_list('university_school_id', flat=True))
+    mark_school_catalogs_stale(school_ids)
+    bump_school_data_version()
+
+
+@receiver(post_save, sender=NonDegreeCourseDate)
+@receiver(post_delete, sender=NonDegreeCourseDate)
+@receiver(post_save, sender=NonDegreeCourseURL)
+@receiver(post_delete, sender=NonDegreeCourseURL)
+def mark_course_catalog_stale(sender, instance, **kwargs):
+    school_ids = set(NonDegreeCourse.objects.filter(pk=instance.course_id).values_list('university_school_id',
+                                                                                      flat=True))
+    school_ids.update(NonDegreeCategory.objects.filter(nondegreecourse=instance.course_id)
+                      .values_list('university_school_id', flat=True))
+    mark_school_catalogs_stale(school_ids)
+    bump_school_data_version()
+
+
+@receiver(post_save, sender=NonDegreeCategoryURL)
+@receiver(post_delete, sender=NonDegreeCategoryURL)
+def mark_category_catalog_stale(sender, instance, **kwargs):
+    mark_school_catalogs_stale(NonDegreeCategory.objects.filter(pk=instance.category_id)
+                               .values_list('university_school_id', flat=True))
+    bump_school_data_version()
+
+
+@receiver(m2m_changed, sender=NonDegreeCourse.category.through)
+def mark_catalog_stale_on_course_categories_change(sender, instance, action, pk_set=None, **kwargs):
+    if action in ('pre_clear', 'post_add', 'post_remove'):
+        # on clear, pk_set is empty, so the old categories are read before they are removed
+        school_ids = set()
+        if isinstance(instance, NonDegreeCourse):
+            school_ids.add(instance.university_school_id)
+            categories = NonDegreeCategory.objects.filter(pk__in=pk_set) if pk_set else instance.category.all()
+            school_ids.update(categories.values_list('university_school_id', flat=True))
+        else:
+            school_ids.add(instance.university_school_id)
+        mark_school_catalogs_stale(school_ids)
+        bump_school_data_version()
+
+
+@receiver(post_save, sender=NonDegreeCourse)
+def update_course_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'name' in update_fields or 'university_school' in update_fields:
+        update_course_search_vectors(course_ids=[instance.pk])
+
+
+@receiver(post_save, sender=UniversitySchool)
+def update_school_course_search_vectors(sender, instance, **kwargs):
+    update_school_search_vectors(school_ids=[instance.pk])
+    update_course_search_vectors(school_ids=[instance.pk])
+
+
+@receiver(post_save, sender=UniversitySchool.university_foreign_key.field.related_model)
+def update_university_course_search_vectors(sender, instance, **kwargs):
+    school_ids = list(UniversitySchool.objects.filter(university_foreign_key=instance)
+                      .values_list('object_id', flat=True))
+    update_school_search_vectors(school_ids=school_ids)
+    update_course_search_vectors(school_ids=school_ids)
+
+
+@receiver(post_save, sender=NonDegreeCourse)
+def update_course_name_index(sender, instance, **kwargs):
+    course_name_index.object_saved(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=NonDegreeCourse)
+def remove_from_course_name_index(sender, instance, **kwargs):
+    course_name_index.object_deleted(instance.pk)
+
+
+@receiver(m2m_changed, sender=Program.same_as_many.through)
+def update_program_clusters(sender, instance, action, pk_set=None, **kwargs):
+    if action == 'post_add':
+        program_clusters.add_links(instance.pk, pk_set or ())
+    elif action in ('post_remove', 'post_clear'):
+        program_clusters.mark_stale()
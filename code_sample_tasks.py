@@ -0,0 +1,113 @@
+class BatchUpdateJobQueue(object):
+    """
+    Batch updates that run outside of the admin request.
+    Jobs are stored in ProgramBatchUpdateJob, so every worker process sees them, and their chunks run on a local
+    thread pool, every chunk in its own transaction. No external broker is needed.
+    """
+    stale_after = 10 * 60   # a pending or running job that made no progress for this long is taken as interrupted
+
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, user, data, program_ids, chunk_size=500):
+        """
+        :param user: user saved as modified_by of the programs
+        :param data: posted batch update form, a QueryDict
+        :param program_ids: primary keys of all selected programs
+        :param chunk_size: number of programs updated per transaction
+        :return: ProgramBatchUpdateJob
+        """
+        program_ids = [str(program_id) for program_id in program_ids]
+        data = dict((name, values) for name, values in data.lists() if name != 'csrfmiddlewaretoken')
+        job = ProgramBatchUpdateJob.objects.create(
+            created_by=user, modified_by=user, data=json.dumps(data),
+            chunks=json.dumps([program_ids[i:i + chunk_size] for i in range(0, len(program_ids), chunk_size)]))
+        transaction.on_commit(lambda: self.executor.submit(self.run, job.pk))
+        return job
+
+    def get(self, job_id):
+        try:
+            job_id = uuid.UUID(str(job_id))
+        except ValueError:
+            return None
+        return ProgramBatchUpdateJob.objects.filter(pk=job_id).first()
+
+    def resume(self, job):
+        """
+        Run a failed or interrupted job again, starting from its first chunk that was not committed.
+        A job is interrupted when its process died while it was running, or while it was still waiting in the
+        thread pool queue. If it is still queued after all, the status claim in run lets only one of them run.
+        """
+        resumable = Q(status=ProgramBatchUpdateJob.FAILED) | \
+            Q(status__in=[ProgramBatchUpdateJob.PENDING, ProgramBatchUpdateJob.RUNNING],
+              date_modified__lt=timezone.now() - timedelta(seconds=self.stale_after))
+        if not ProgramBatchUpdateJob.objects.filter(resumable, pk=job.pk)\
+                .update(status=ProgramBatchUpdateJob.PENDING, date_modified=timezone.now()):
+            return False
+        self.executor.submit(self.run, job.pk)
+        return True
+
+    @staticmethod
+    def run(job_id):
+        try:
+            # claim the job, so a job is never run by two threads at once
+            if not ProgramBatchUpdateJob.objects.filter(pk=job_id, status=ProgramBatchUpdateJob.PENDING)\
+                    .update(status=ProgramBatchUpdateJob.RUNNING, date_modified=timezone.now()):
+                return
+            job = ProgramBatchUpdateJob.objects.select_related('created_by').get(pk=job_id)
+            batch_update = ProgramBatchUpdate(job.created_by, job.get_data())
+            chunks = json.loads(job.chunks)
+            chunk_results = json.loads(job.chunk_results)
+            for chunk_index in range(job.next_chunk, len(chunks)):
+                try:
+                    with transaction.atomic():
+                        results = batch_update.apply(Program.objects.filter(pk__in=chunks[chunk_index]))
+                        errors = ['For program {0}, can not update: {1}. Please create them first.'
+                                  .format(program.object_id, ", ".join(not_updated_tables))
+                                  for program, updated_tables, not_updated_tables in results if not_updated_tables]
+                        chunk_result = {'chunk': chunk_index, 'status': ProgramBatchUpdateJob.DONE,
+                                        'updated': len(results), 'errors': errors}
+                        ProgramBatchUpdateJob.objects.filter(pk=job_id).update(
+                            next_chunk=chunk_index + 1, chunk_results=json.dumps(chunk_results + [chunk_result]),
+                            date_modified=timezone.now())
+                except Exception as e:
+                    logger.exception('Batch update job {0} failed at chunk {1}'.format(job_id, chunk_index))
+                    chunk_results.append({'chunk': chunk_index, 'status': ProgramBatchUpdateJob.FAILED,
+                                          'error': str(e)})
+                    ProgramBatchUpdateJob.objects.filter(pk=job_id).update(
+                        status=ProgramBatchUpdateJob.FAILED, chunk_results=json.dumps(chunk_results),
+                        date_modified=timezone.now())
+                    return
+                chunk_results.append(chunk_result)
+            ProgramBatchUpdateJob.objects.filter(pk=job_id).update(
+                status=ProgramBatchUpdateJob.DONE, date_modified=timezone.now())
+        finally:
+            connection.close()      # the worker thread owns its own database connection
+
+
+batch_update_jobs = BatchUpdateJobQueue()
+
+
+class Outbox(object):
+    """
+    Side effects, like emails and audit logs, that run after the current transaction commits.
+    They run on a local worker thread, so the request doesn't wait for them.
+    """
+
+    def __init__(self, max_workers=1):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def add(self, func, *args, **kwargs):
+        transaction.on_commit(lambda: self.executor.submit(self.run, func, *args, **kwargs))
+
+    @staticmethod
+    def run(func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Outbox task {0} failed'.format(getattr(func, '__name__', func)))
+        finally:
+            connection.close()
+
+
+outbox = Outbox()
@@ -1,13 +1,15 @@
-class UniversitySchoolListAPI(PermissionMixin, ListAPIView):
+class UniversitySchoolListAPI(PermissionMixin, CachedResponseMixin, ListAPIView):
     """
     Get list of user university school API
     """
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter)
     serializer_class = UniversitySchoolListSerializer
-    pagination_class = UniversitySchoolPagination
+    pagination_class = UniversitySchoolKeysetPagination
     filter_class = UniversitySchoolFilter
 
     search_fields = ('ceeb', 'school', 'university_foreign_key__name',)
+    search_substring_fields = ('ceeb', 'school',)
+    search_vector = 'search_document__search_vector'
     ordering_fields = ('ceeb', 'school', 'num_university_costomers', )
     ordering = ('ceeb', 'school', )      # default ordering
 
@@ -18,7 +20,32 @@ class UniversitySchoolListAPI(PermissionMixin, ListAPIView):
         else:
             university_schools = UniversitySchool.objects.filter(non_degree_user=self.request.user)\
                 .annotate(num_university_costomers=Count('non_degree_user'))
-        return university_schools
+        return university_schools.select_related('university_foreign_key').prefetch_related(
+            Prefetch('non_degree_user', queryset=UniversityCustomer.objects.filter(is_demo=False),
+                     to_attr='non_demo_customers'))
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request,
+                                    lambda: super(UniversitySchoolListAPI, self).list(request, *args, **kwargs))
+
+
+class UniversitySchoolDetailAPI(PermissionMixin, CachedResponseMixin, RetrieveAPIView):
+    """
+    Get university school detail API
+    """
+    serializer_class = UniversitySchoolDetailSerializer
+    lookup_field = 'object_id'
+
+    def get_queryset(self, *args, **kwargs):
+        if self.is_manager():
+            university_schools = UniversitySchool.objects.all()
+        else:
+            university_schools = UniversitySchool.objects.filter(non_degree_user=self.request.user)
+        return university_schools.select_related('university_foreign_key')
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request,
+                                    lambda: super(UniversitySchoolDetailAPI, self).retrieve(request, *args, **kwargs))
 
 
 class ReportCreateListAPI(PermissionMixin, CreateModelMixin, ListAPIView):
@@ -26,7 +53,7 @@ class ReportCreateListAPI(PermissionMixin, CreateModelMixin, ListAPIView):
     Get list of user non-degree report API & Create non-degree report API
     """
     filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
-    pagination_class = ReportPagination
+    pagination_class = ReportKeysetPagination
     filter_class = ReportFilter
 
     search_fields = ('school__school', 'school__ceeb',)
@@ -49,6 +76,9 @@ class ReportCreateListAPI(PermissionMixin, CreateModelMixin, ListAPIView):
 
     @staticmethod
     def create_report(request):
+        """
+        :return: categories snapshot of the school, read from its materialized catalog
+        """
         if 'school' not in request.data:
             raise ValidationError("School object_id is required.")
         try:
@@ -56,9 +86,7 @@ class ReportCreateListAPI(PermissionMixin, CreateModelMixin, ListAPIView):
         except UniversitySchool.DoesNotExist:
             raise ValidationError("Can not find school with this object_id.")
 
-        categories = NonDegreeCategory.objects.filter(university_school=school).filter(active=True)
-        data = JSONRenderer().render(CategorySerializer(categories, many=True).data)
-        return data
+        return get_school_catalog(school).categories.encode('utf-8')
 
     def create(self, request, *args, **kwargs):
         if not self.is_manager():
@@ -69,11 +97,14 @@ class ReportCreateListAPI(PermissionMixin, CreateModelMixin, ListAPIView):
 
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        report = serializer.save()
+        with transaction.atomic():
+            report = serializer.save()
+            customer_ids = UniversityCustomer.objects.filter(non_degree_schools=report.school)\
+                .values_list('pk', flat=True)
+            NonDegreeReportCustomerMapping.objects.bulk_create([
+                NonDegreeReportCustomerMapping(report=report, customer_id=customer_id) for customer_id in customer_ids
+            ])
         headers = self.get_success_headers(serializer.data)
-        customers = UniversityCustomer.objects.filter(non_degree_schools=report.school)
-        for customer in customers:
-            NonDegreeReportCustomerMapping.objects.create(report=report, customer=customer)
         return Response(serializer.data, status=HTTP_201_CREATED, headers=headers)
 
     def post(self, request, *args, **kwargs):
@@ -121,13 +152,16 @@ class NonDegreeCourseAPI(PermissionMixin, ListModelMixin, GenericAPIView):
     """
     Get list of user courses API
     """
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter, MultipleSearchFilter)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter, MultipleSearchFilter)
     serializer_class = CourseSerializer
-    pagination_class = BasePagination
+    pagination_class = CourseKeysetPagination
     filter_class = CourseFilter
 
     search_fields = ('name', )
+    search_substring_fields = ('name', )
+    search_vector = 'search_vector'
     multiple_search_fields = ('name', )
+    multiple_search_index = course_name_index
     ordering_fields = ('name', 'university_school__school',)
     ordering = ('university_school__school', 'name', )      # default ordering
 
@@ -139,3 +173,50 @@ class NonDegreeCourseAPI(PermissionMixin, ListModelMixin, GenericAPIView):
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
+
+
+class ProgramAssignmentImportAPI(PermissionMixin, GenericAPIView):
+    """
+    Bulk import program assignments API.
+    Accepts a CSV or JSONL file of (program, assignee, reviewer, status) rows, or a list of rows in 'rows'.
+    """
+    parser_classes = (MultiPartParser, JSONParser)
+
+    def post(self, request, *args, **kwargs):
+        if not self.is_manager():
+            return Response({"Failed": "Permission Denied!"}, status=HTTP_403_FORBIDDEN)
+
+        if 'file' in request.FILES:
+            upload = request.FILES['file']
+            file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+            try:
+                rows = read_assignment_rows(io.TextIOWrapper(upload.file, encoding='utf-8'), file_format)
+            except ValueError as e:
+                raise ValidationError(str(e))
+        elif 'rows' in request.data:
+            rows = request.data['rows']
+        else:
+            raise ValidationError("A file or rows are required.")
+
+        result = ProgramAssignmentImport(request.user).apply(rows)
+        return Response(result, status=HTTP_200_OK)
+
+
+class ReportBatchCreateAPI(PermissionMixin, GenericAPIView):
+    """
+    Create non-degree reports for many schools API.
+    Post a list of school object_ids in 'schools', or 'all' for all schools with active categories.
+    """
+    serializer_class = ReportBatchCreateSerializer
+
+    def post(self, request, *args, **kwargs):
+        if not self.is_manager():
+            return Response({"Failed": "Permission Denied!"}, status=HTTP_403_FORBIDDEN)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        school_ids = None if serializer.validated_data['all'] else serializer.validated_data['schools']
+
+        start_time = time.time()
+        results = create_school_reports(school_ids)
+        return Response({'seconds': round(time.time() - start_time, 3), 'results': results},
+                        status=HTTP_201_CREATED)
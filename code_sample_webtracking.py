@@ -0,0 +1,207 @@
+def normalize_url(url):
+    return url.strip() if url else ''
+
+
+class WebPageCache(object):
+    """
+    Process-local LRU cache of normalized URL -> WebPage object_id.
+    Entries expire after ttl seconds, and WebPage post_save/post_delete signals invalidate them.
+    """
+
+    def __init__(self, max_size=50000, ttl=60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()    # url: (webpage id, expire time), least recently used first
+        self.urls_by_id = {}            # webpage id: url
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        url = normalize_url(url)
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and entry[1] > time.time():
+                self.entries.move_to_end(url)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(url)
+            self.misses += 1
+            return None
+
+    def set(self, url, webpage_id):
+        url = normalize_url(url)
+        with self.lock:
+            if url in self.entries:
+                self._remove(url)
+            self.entries[url] = (webpage_id, time.time() + self.ttl)
+            self.urls_by_id[webpage_id] = url
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, url=None, webpage_id=None):
+        with self.lock:
+            if url is not None and normalize_url(url) in self.entries:
+                self._remove(normalize_url(url))
+            if webpage_id is not None and webpage_id in self.urls_by_id:
+                self._remove(self.urls_by_id[webpage_id])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.urls_by_id.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, url):
+        webpage_id, expire_time = self.entries.pop(url)
+        if self.urls_by_id.get(webpage_id) == url:
+            del self.urls_by_id[webpage_id]
+
+
+web_page_cache = WebPageCache()
+
+
+class WebTrackingRegistry(object):
+    """
+    Register URLs for web tracking.
+    URLs are de-duplicated in memory, URLs that already have a WebPage are skipped, and the missing ones are
+    inserted with one parameterized statement.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def register(self, urls, verify=False):
+        """
+        Make sure every URL has a WebPage.
+        :param urls: iterable of URLs, may contain duplicates and empty values
+        :param verify: check cached ids with one query before returning them. Use it when the ids are written as
+            foreign keys, because a WebPage deleted by another process stays in this process's cache until it expires.
+        :return: a dict of normalized URL: WebPage object_id
+        """
+        webpage_ids = {}
+        missing_urls = set()
+        for url in set(normalize_url(url) for url in urls) - {''}:
+            webpage_id = self.cache.get(url)
+            if webpage_id is None:
+                missing_urls.add(url)
+            else:
+                webpage_ids[url] = webpage_id
+        if verify and webpage_ids:
+            existing_ids = set(str(webpage_id) for webpage_id in
+                               WebPage.objects.filter(pk__in=webpage_ids.values()).values_list('pk', flat=True))
+            for url, webpage_id in list(webpage_ids.items()):
+                if str(webpage_id) not in existing_ids:
+                    self.cache.invalidate(url=url)
+                    del webpage_ids[url]
+                    missing_urls.add(url)
+        if missing_urls:
+            webpage_ids.update(self.fetch(missing_urls))
+            missing_urls -= set(webpage_ids)
+        if missing_urls:
+            webpage_ids.update(self.insert(sorted(missing_urls)))
+            missing_urls -= set(webpage_ids)
+        if missing_urls:
+            # inserted by someone else between our select and insert
+            webpage_ids.update(self.fetch(missing_urls))
+        return webpage_ids
+
+    def fetch(self, urls):
+        webpage_ids = dict(WebPage.objects.filter(url__in=urls).values_list('url', 'object_id'))
+        for url, webpage_id in webpage_ids.items():
+            self.cache.set(url, webpage_id)
+        return webpage_ids
+
+    def insert(self, urls):
+        now = timezone.now()
+        params = []
+        for url in urls:
+            params += [str(uuid.uuid4()), now, now, 0, url, True, 0]
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                    INSERT INTO "webtracking_webpage"
+                        ("object_id", "date_created", "date_modified", "revision", "url", "enabled",
+                        "fetch_error_count")
+                        VALUES
+                        {values}
+                        ON CONFLICT DO NOTHING
+                        RETURNING "url", "object_id";
+                    """.format(values=','.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(urls))), params)
+            webpage_ids = dict(cursor.fetchall())
+        for url, webpage_id in webpage_ids.items():
+            self.cache.set(url, webpage_id)
+        return webpage_ids
+
+
+web_tracking = WebTrackingRegistry(web_page_cache)
+
+
+# URL fields of a program and of its inline tables that ProgramAdmin registers for web tracking
+PROGRAM_TRACKING_URL_FIELDS = ['url', 'homepage_url', 'additional_url', 'parent_handbook_url', 'program_faq_url',
+                               'stats_profile_url', 'admission_stats_parent_url', 'job_placement_url',
+                               'job_placement_parent_url', 'part_time_url', 'nitty_gritty_degree_duration_program_url',
+                               'curriculum_url', 'transfer_unit_url', 'thesis_url', 'dissertation_url',
+                               'university_cost_url', 'school_cost_url', 'deadline_url', 'program_req_url',
+                               'school_req_url', 'intl_req_url', 'scholarship_program_specific_url',
+                               'scholarship_general_url']
+PROGRAM_URL_TABLES = ['duration', 'curriculum', 'tuition', 'deadline', 'requirement', 'scholarship']
+
+
+def program_tracking_urls(urls=None):
+    """
+    URLs that a program or one of its inline tables still refers to in a tracking URL field.
+    :param urls: only look for these URLs, look for all if None
+    :return: a list of querysets of normalized URLs, each with a single 'tracked_url' column
+    """
+    url_querysets = []
+    for model in [Program] + [Program._meta.get_field(table).related_model for table in PROGRAM_URL_TABLES]:
+        field_names = set(field.name for field in model._meta.concrete_fields)
+        for url_name in PROGRAM_TRACKING_URL_FIELDS:
+            if url_name not in field_names:
+                continue
+            queryset = model.objects.exclude(**{url_name + '__isnull': True}).annotate(tracked_url=Trim(url_name))
+            if urls is not None:
+                queryset = queryset.filter(tracked_url__in=urls)
+            url_querysets.append(queryset.values('tracked_url'))
+    return url_querysets
+
+
+def orphan_web_pages(urls=None):
+    """
+    WebPages that no category URL, course URL, program map or program tracking URL field refers to.
+    :param urls: only check WebPages of these URLs, check the whole table if None
+    :return: WebPage queryset
+    """
+    web_pages = WebPage.objects.all()
+    category_urls = NonDegreeCategoryURL.objects.all()
+    course_urls = NonDegreeCourseURL.objects.all()
+    program_maps = WebPageProgramMap.objects.all()
+    if urls is not None:
+        web_pages = web_pages.filter(url__in=urls)
+        category_urls = category_urls.filter(url__in=urls)
+        course_urls = course_urls.filter(url__in=urls)
+        program_maps = program_maps.filter(webpage__url__in=urls)
+    web_pages = web_pages.exclude(url__in=category_urls.values('url'))\
+                         .exclude(url__in=course_urls.values('url'))\
+                         .exclude(object_id__in=program_maps.values('webpage'))
+    for tracked_urls in program_tracking_urls(urls):
+        web_pages = web_pages.exclude(url__in=tracked_urls)
+    return web_pages
+
+
+def delete_orphan_web_pages(urls=None):
+    """
+    Delete orphaned WebPages with one query.
+    :param urls: only check WebPages of these URLs, check the whole table if None
+    :return: number of deleted WebPages
+    """
+    if urls is not None:
+        urls = set(urls)
+        if not urls:
+            return 0
+    deleted, deleted_per_model = orphan_web_pages(urls).delete()
+    return deleted_per_model.get(WebPage._meta.label, 0)